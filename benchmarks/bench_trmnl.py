@@ -0,0 +1,368 @@
+"""Benchmarks for the TRMNL Entity Blaster integration.
+
+Drives entity formatting, payload packing and full update ticks against a
+synthetic Home Assistant instance with labelled entities. Webhook pushes go
+to a local aiohttp stand-in server that counts the bytes it receives.
+
+Requires Home Assistant to be installed:
+
+    python benchmarks/bench_trmnl.py --entities 10 100 1000 10000 --groups 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+import pathlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import (  # noqa: E402
+    area_registry as ar,
+    category_registry as cr,
+    device_registry as dr,
+    entity_registry as er,
+    floor_registry as fr,
+    label_registry as lr,
+)
+
+from custom_components.trmnl_sensor_blaster import (  # noqa: E402
+    async_setup_entry,
+    async_unload_entry,
+)
+from custom_components.trmnl_sensor_blaster.const import (  # noqa: E402
+    CONF_SENSOR_GROUPS,
+    CONF_URL,
+    DOMAIN,
+    MAX_PAYLOAD_SIZE,
+    PRIORITY_LABEL,
+)
+from custom_components.trmnl_sensor_blaster.packing import pack_grouped_payload  # noqa: E402
+from custom_components.trmnl_sensor_blaster.payload import create_minimal_entity_payload  # noqa: E402
+
+ICONS = ["mdi:thermometer", "mdi:water-percent", "mdi:flash", "mdi:trash-can", None]
+UNITS = ["°C", "%", "W", None]
+
+class FakeConfigEntry:
+    """The parts of a config entry the integration uses."""
+
+    def __init__(self, data: dict, options: dict | None = None) -> None:
+        """Initialize the entry."""
+        self.entry_id = uuid.uuid4().hex
+        self.title = "TRMNL Blaster (benchmark)"
+        self.data = data
+        self.options = options or {}
+
+    def add_update_listener(self, listener):
+        """Options never change during a benchmark, return a no-op removal."""
+        return lambda: None
+
+    def async_on_unload(self, func) -> None:
+        """Nothing to clean up, the entry is unloaded by the benchmark itself."""
+
+class FakeConfigEntries:
+    """Config entry manager that skips platform setup."""
+
+    async def async_forward_entry_setups(self, entry, platforms) -> None:
+        """Skip setting up platforms."""
+
+    async def async_unload_platforms(self, entry, platforms) -> bool:
+        """Skip unloading platforms."""
+        return True
+
+class WebhookStandIn:
+    """Local stand-in for the TRMNL webhook endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize the server."""
+        self.requests = 0
+        self.bytes_received = 0
+        self.received = asyncio.Event()
+        self.url = ""
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        """Start listening on a free local port."""
+        app = web.Application()
+        app.router.add_post("/api/custom_plugins/{plugin}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/api/custom_plugins/benchmark"
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Count a webhook request."""
+        body = await request.read()
+        self.requests += 1
+        self.bytes_received += len(body)
+        self.received.set()
+        return web.Response(text='{"message": "ok"}')
+
+class LoopLagMonitor:
+    """Measure how long the event loop is blocked."""
+
+    def __init__(self, interval: float = 0.001) -> None:
+        """Initialize the monitor."""
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self._task:
+            self._task.cancel()
+
+    def reset(self) -> None:
+        """Forget the lag seen so far."""
+        self.max_lag = 0.0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, loop.time() - start - self.interval)
+
+@dataclass
+class Result:
+    """Measurements of one scenario."""
+
+    name: str
+    entities: int
+    timings: list[float] = field(default_factory=list)
+    max_lag: float = 0.0
+    peak_alloc: int = 0
+    bytes_sent: int = 0
+    pushes: int = 0
+
+    def row(self) -> str:
+        """Format the result as a table row."""
+        timings = sorted(self.timings) or [0.0]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return (
+            f"{self.name:<10} {self.entities:>7} {statistics.median(timings) * 1000:>10.3f}"
+            f" {p95 * 1000:>10.3f} {self.max_lag * 1000:>10.3f}"
+            f" {self.peak_alloc / 1024:>10.1f} {self.pushes:>7} {self.bytes_sent:>9}"
+        )
+
+HEADER = (
+    f"{'scenario':<10} {'entities':>7} {'median ms':>10} {'p95 ms':>10} {'lag ms':>10}"
+    f" {'peak KiB':>10} {'pushes':>7} {'bytes':>9}"
+)
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    """Create a Home Assistant instance with in-memory registries."""
+    hass = HomeAssistant(config_dir)
+    hass.config_entries = FakeConfigEntries()
+    for registry in (ar, cr, dr, er, fr, lr):
+        await registry.async_load(hass)
+    return hass
+
+def populate(hass: HomeAssistant, entities: int, groups: int, rng: random.Random) -> list[str]:
+    """Create labelled entities and return the group labels."""
+    label_reg = lr.async_get(hass)
+    ent_reg = er.async_get(hass)
+    labels = [label_reg.async_create(f"group_{index}").label_id for index in range(groups)]
+    priority = label_reg.async_create(PRIORITY_LABEL).label_id
+
+    for index in range(entities):
+        entry = ent_reg.async_get_or_create(
+            "sensor", "benchmark", str(index), suggested_object_id=f"bench_{index}"
+        )
+        entity_labels = {labels[index % groups]}
+        # Some entities carry two labels to exercise the overlap between groups
+        if rng.random() < 0.2:
+            entity_labels.add(rng.choice(labels))
+        if rng.random() < 0.05:
+            entity_labels.add(priority)
+        ent_reg.async_update_entity(entry.entity_id, labels=entity_labels)
+        set_random_state(hass, entry.entity_id, rng)
+    return labels
+
+def set_random_state(hass: HomeAssistant, entity_id: str, rng: random.Random) -> None:
+    """Give an entity a random state."""
+    index = int(entity_id.rsplit('_', 1)[-1])
+    unit = UNITS[index % len(UNITS)]
+    attributes = {"friendly_name": f"Sensor {index}"}
+    if unit:
+        attributes["unit_of_measurement"] = unit
+    if icon := ICONS[index % len(ICONS)]:
+        attributes["icon"] = icon
+    value = f"{rng.uniform(0, 100):.2f}" if unit else rng.choice(["on", "off", "Tuesday"])
+    hass.states.async_set(entity_id, value, attributes)
+
+def bench_format(hass: HomeAssistant, entities: int, rounds: int) -> Result:
+    """Benchmark create_minimal_entity_payload over all states."""
+    result = Result("format", entities)
+    states = hass.states.async_all()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for state in states:
+            create_minimal_entity_payload(state)
+        result.timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for state in states:
+        create_minimal_entity_payload(state)
+    result.peak_alloc = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+def bench_pack(hass: HomeAssistant, labels: list[str], entities: int, rounds: int) -> Result:
+    """Benchmark fitting every entity into the payload size limit."""
+    result = Result("pack", entities)
+    ent_reg = er.async_get(hass)
+    grouped: dict[str, list[dict]] = {label: [] for label in labels}
+    for state in hass.states.async_all():
+        if entry := ent_reg.async_get(state.entity_id):
+            for label in entry.labels & grouped.keys():
+                grouped[label].append(create_minimal_entity_payload(state))
+    grouped = {label: payloads for label, payloads in grouped.items() if payloads}
+    timestamp = datetime.now().isoformat()
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        pack_grouped_payload(grouped, timestamp, MAX_PAYLOAD_SIZE)
+        result.timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    pack_grouped_payload(grouped, timestamp, MAX_PAYLOAD_SIZE)
+    result.peak_alloc = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+async def bench_tick(
+    hass: HomeAssistant,
+    labels: list[str],
+    entities: int,
+    ticks: int,
+    change_ratio: float,
+    destinations: int,
+    rng: random.Random,
+) -> tuple[Result, Result, Result]:
+    """Benchmark full update ticks and the state changes feeding them.
+
+    With several destinations every entry shows an overlapping half of the
+    groups and a tick refreshes all of them.
+    """
+    server = WebhookStandIn()
+    await server.start()
+    monitor = LoopLagMonitor()
+    if destinations == 1:
+        entry_groups = [labels]
+    else:
+        half = max(1, len(labels) // 2)
+        entry_groups = [
+            [labels[(index + offset) % len(labels)] for offset in range(half)]
+            for index in range(destinations)
+        ]
+    entries = [
+        FakeConfigEntry({CONF_URL: server.url, CONF_SENSOR_GROUPS: groups})
+        for groups in entry_groups
+    ]
+
+    setup = Result("setup", entities)
+    start = time.perf_counter()
+    for entry in entries:
+        await async_setup_entry(hass, entry)
+    setup.timings.append(time.perf_counter() - start)
+    refreshes = [hass.data[DOMAIN][entry.entry_id]["refresh"] for entry in entries]
+
+    events = Result("events", entities)
+    tick = Result("tick", entities)
+    entity_ids = hass.states.async_entity_ids()
+    changes = max(1, int(len(entity_ids) * change_ratio))
+    monitor.start()
+    for measure_alloc in [False] * ticks + [True]:
+        start = time.perf_counter()
+        for entity_id in rng.sample(entity_ids, changes):
+            set_random_state(hass, entity_id, rng)
+        await hass.async_block_till_done()
+        events.timings.append(time.perf_counter() - start)
+        server.received.clear()
+        monitor.reset()
+
+        if measure_alloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for refresh in refreshes:
+            await refresh()
+        elapsed = time.perf_counter() - start
+
+        # Let the delivery worker push before measuring the loop lag
+        try:
+            await asyncio.wait_for(server.received.wait(), 5)
+        except asyncio.TimeoutError:
+            pass
+
+        if measure_alloc:
+            tick.peak_alloc = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            tick.timings.append(elapsed)
+            tick.max_lag = max(tick.max_lag, monitor.max_lag)
+
+    monitor.stop()
+    tick.pushes = server.requests
+    tick.bytes_sent = server.bytes_received
+    for entry in entries:
+        await async_unload_entry(hass, entry)
+    await server.stop()
+    return setup, events, tick
+
+async def async_run(args: argparse.Namespace) -> None:
+    """Run all scenarios for every entity count."""
+    print(HEADER)
+    for entities in args.entities:
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = await async_create_hass(config_dir)
+            labels = populate(hass, entities, args.groups, rng)
+            print(bench_format(hass, entities, args.rounds).row())
+            print(bench_pack(hass, labels, entities, args.rounds).row())
+            for result in await bench_tick(
+                hass, labels, entities, args.ticks, args.change_ratio, args.destinations, rng
+            ):
+                print(result.row())
+            await hass.async_stop(force=True)
+
+def main() -> None:
+    """Parse arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entities", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--groups", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--change-ratio", type=float, default=0.1)
+    parser.add_argument("--destinations", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    asyncio.run(async_run(args))
+
+if __name__ == "__main__":
+    main()
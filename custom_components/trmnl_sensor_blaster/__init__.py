@@ -1,148 +1,293 @@
 """The TRMNL Entity Blaster integration."""
 from __future__ import annotations
 
+import asyncio
 import logging
-import json
 from datetime import datetime, timedelta
-import asyncio
-import aiohttp
+import time
+from typing import Any
+
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.event import async_track_time_interval
-from homeassistant.helpers.template import Template
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.storage import Store
 
-from .const import DOMAIN, MIN_TIME_BETWEEN_UPDATES, CONF_URL, CONF_SENSOR_GROUPS, MAX_PAYLOAD_SIZE, DEFAULT_SENSOR_GROUPS
+from .const import (
+    DOMAIN,
+    MIN_TIME_BETWEEN_UPDATES,
+    CONF_URL,
+    CONF_SENSOR_GROUPS,
+    CONF_FORCE_REFRESH_INTERVALS,
+    CONF_UPDATE_INTERVAL,
+    CONF_ADAPTIVE_INTERVAL,
+    CONF_PAYLOAD_SCHEMA,
+    CONF_HISTORY_GROUPS,
+    CONF_HISTORY_WINDOW,
+    CONF_PRIORITY_LABEL,
+    CONF_PRIORITY_PUSH,
+    CONF_VALUE_FORMATS,
+    CONF_AREAS,
+    CONF_DOMAINS,
+    CONF_MAX_PAYLOAD_SIZE,
+    MAX_PAYLOAD_SIZE,
+    EXECUTOR_BUILD_THRESHOLD,
+    DEFAULT_SENSOR_GROUPS,
+    DEFAULT_FORCE_REFRESH_INTERVALS,
+    DEFAULT_ADAPTIVE_INTERVAL,
+    DEFAULT_PAYLOAD_SCHEMA,
+    DEFAULT_HISTORY_WINDOW,
+    DEFAULT_PRIORITY_PUSH,
+    PRIORITY_LABEL,
+    PRIORITY_PUSH_COOLDOWN,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+    SERVICE_PREVIEW,
+    ATTR_CONFIG_ENTRY_ID,
+)
+from .encoding import PAYLOAD_ENCODINGS
+from .history import HistoryAggregator
+from .label_index import async_get_label_index, async_release_label_index
+from .metrics import PerformanceMetrics
+from .packing import PackResult, build_payload, pack_grouped_payload
+from .payload import SensorGroupPayloadBuilder, encode_payload, payload_fingerprint
+from .scheduler import async_get_scheduler
+from .snapshot import async_get_entity_snapshot, async_release_entity_snapshot
+from .transform import compile_value_formats
+from .webhook import TrmnlDeliveryWorker, async_get_webhook_client
 
 _LOGGER = logging.getLogger(__name__)
 
 # Since this integration only supports config entries, use this schema
 CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
-def create_minimal_entity_payload(state) -> dict:
-    """Create minimal payload for a single entity with name, value, and optional icon."""
-    # Use friendly name if available, otherwise use entity_id
-    name = state.attributes.get('friendly_name', state.entity_id.split('.')[-1])
-    
-    # Format the value appropriately
-    value = state.state
-    unit = state.attributes.get('unit_of_measurement')
-    if unit and value not in ['unknown', 'unavailable']:
-        try:
-            # Try to format numeric values nicely
-            float_val = float(value)
-            if float_val.is_integer():
-                value = f"{int(float_val)}{unit}"
-            else:
-                value = f"{float_val:.1f}{unit}"
-        except (ValueError, TypeError):
-            # If not numeric, just append unit if it exists
-            if unit:
-                value = f"{value}{unit}"
-    
-    payload = {
-        "name": name,
-        "value": value
-    }
-    
-    # Add icon if available
-    icon = state.attributes.get('icon')
-    if icon:
-        payload["icon"] = icon
-    
-    _LOGGER.debug("TRMNL: Created minimal payload for %s: %s", state.entity_id, payload)
-    return payload
+PLATFORMS = [Platform.SENSOR]
 
-def calculate_payload_size(payload: dict) -> int:
-    """Calculate the size of the payload in bytes."""
-    return len(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+PREVIEW_SCHEMA = vol.Schema({vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string})
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the TRMNL Entity Blaster component."""
     _LOGGER.debug("TRMNL: Setting up TRMNL Entity Blaster component")
+
+    async def async_handle_preview(call: ServiceCall) -> ServiceResponse:
+        """Build the payloads of one or all entries without pushing them."""
+        entries = hass.data.get(DOMAIN, {})
+        if ATTR_CONFIG_ENTRY_ID in call.data:
+            entry_ids = [call.data[ATTR_CONFIG_ENTRY_ID]]
+        else:
+            entry_ids = list(entries)
+        previews = {}
+        for entry_id in entry_ids:
+            if entry_id not in entries:
+                raise ServiceValidationError(f"TRMNL config entry {entry_id} is not loaded")
+            previews[entry_id] = await entries[entry_id]["preview"]()
+        return previews
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PREVIEW,
+        async_handle_preview,
+        schema=PREVIEW_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up TRMNL Entity Blaster from a config entry."""
     _LOGGER.debug("TRMNL: Setting up config entry")
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = {}
+    # Restore the last pushed payload so a restart does not push it again
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+    stored = await store.async_load() or {}
+    hass.data[DOMAIN][entry.entry_id] = {
+        "last_fingerprint": stored.get("fingerprint"),
+        "last_payload": stored.get("payload"),
+        "unchanged_updates": 0,
+        "metrics": PerformanceMetrics(),
+        "store": store,
+    }
+    entry_data = hass.data[DOMAIN][entry.entry_id]
 
     # Get configuration values
     url = entry.data.get(CONF_URL)
     sensor_groups = entry.data.get(CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS)
+    force_refresh_intervals = entry.data.get(CONF_FORCE_REFRESH_INTERVALS, DEFAULT_FORCE_REFRESH_INTERVALS)
+    update_interval = entry.data.get(CONF_UPDATE_INTERVAL, MIN_TIME_BETWEEN_UPDATES)
+    adaptive_interval = entry.data.get(CONF_ADAPTIVE_INTERVAL, DEFAULT_ADAPTIVE_INTERVAL)
+    payload_schema = entry.data.get(CONF_PAYLOAD_SCHEMA, DEFAULT_PAYLOAD_SCHEMA)
+    history_groups = entry.data.get(CONF_HISTORY_GROUPS, [])
+    history_window = entry.data.get(CONF_HISTORY_WINDOW, DEFAULT_HISTORY_WINDOW)
+    priority_label = entry.data.get(CONF_PRIORITY_LABEL, PRIORITY_LABEL)
+    priority_push = entry.data.get(CONF_PRIORITY_PUSH, DEFAULT_PRIORITY_PUSH)
+    value_formats = entry.data.get(CONF_VALUE_FORMATS, {})
+    areas = entry.data.get(CONF_AREAS, [])
+    domains = entry.data.get(CONF_DOMAINS, [])
+    max_payload_size = entry.data.get(CONF_MAX_PAYLOAD_SIZE, MAX_PAYLOAD_SIZE)
     
     # Also check options for updates
     if entry.options:
         url = entry.options.get(CONF_URL, url)
         sensor_groups = entry.options.get(CONF_SENSOR_GROUPS, sensor_groups)
+        force_refresh_intervals = entry.options.get(CONF_FORCE_REFRESH_INTERVALS, force_refresh_intervals)
+        update_interval = entry.options.get(CONF_UPDATE_INTERVAL, update_interval)
+        adaptive_interval = entry.options.get(CONF_ADAPTIVE_INTERVAL, adaptive_interval)
+        payload_schema = entry.options.get(CONF_PAYLOAD_SCHEMA, payload_schema)
+        history_groups = entry.options.get(CONF_HISTORY_GROUPS, history_groups)
+        history_window = entry.options.get(CONF_HISTORY_WINDOW, history_window)
+        priority_label = entry.options.get(CONF_PRIORITY_LABEL, priority_label)
+        priority_push = entry.options.get(CONF_PRIORITY_PUSH, priority_push)
+        value_formats = entry.options.get(CONF_VALUE_FORMATS, value_formats)
+        areas = entry.options.get(CONF_AREAS, areas)
+        domains = entry.options.get(CONF_DOMAINS, domains)
+        max_payload_size = entry.options.get(CONF_MAX_PAYLOAD_SIZE, max_payload_size)
     
     _LOGGER.debug("TRMNL: Using webhook URL: %s", url)
     _LOGGER.debug("TRMNL: Using sensor groups: %s", sensor_groups)
+    if areas or domains:
+        _LOGGER.debug("TRMNL: Limiting groups to areas %s and domains %s", areas, domains)
+    _LOGGER.debug("TRMNL: Using %s payload schema within %d bytes", payload_schema, max_payload_size)
+    _LOGGER.debug("TRMNL: Forcing a refresh every %d unchanged updates", force_refresh_intervals)
 
-    def get_entities_by_groups(groups: list[str]) -> list[str]:
-        """Get entities with specified group labels using template."""
-        _LOGGER.debug("TRMNL: Fetching entities for groups: %s", groups)
-        all_entities = []
-        
-        for group in groups:
-            _LOGGER.debug("TRMNL: Processing group: %s", group)
-            template_str = f"{{{{ label_entities('{group}') }}}}"
-            template = Template(template_str, hass)
-            try:
-                group_entities = template.async_render()
-                if group_entities:
-                    all_entities.extend(group_entities)
-                    _LOGGER.debug("TRMNL: Found %d entities in group '%s'", len(group_entities), group)
-                else:
-                    _LOGGER.debug("TRMNL: No entities found in group '%s'", group)
-            except Exception as err:
-                _LOGGER.error("TRMNL: Error processing group '%s': %s", group, err)
-        
-        # Remove duplicates while preserving order
-        unique_entities = list(dict.fromkeys(all_entities))
-        _LOGGER.debug("TRMNL: Total unique entities found: %d", len(unique_entities))
-        return unique_entities
+    label_index = async_get_label_index(hass)
+    snapshot = async_get_entity_snapshot(hass, label_index)
+    client = async_get_webhook_client(hass)
+
+    @callback
+    def async_payload_delivered(payload: dict, fingerprint: str) -> None:
+        """Remember the content of the last successful push."""
+        entry_data["last_fingerprint"] = fingerprint
+        entry_data["last_payload"] = payload
+        entry_data["unchanged_updates"] = 0
+        store.async_delay_save(lambda: _stored_data(entry_data), STORAGE_SAVE_DELAY)
+
+    metrics = entry_data["metrics"]
+
+    # Deliver payloads in the background so updates never wait on the webhook
+    worker = TrmnlDeliveryWorker(hass, client, url, async_payload_delivered, metrics)
+    worker.async_start()
+    hass.data[DOMAIN][entry.entry_id]["worker"] = worker
+
+    # Aggregate recent history for the groups that show sparklines
+    history = None
+    if history_groups:
+        _LOGGER.debug("TRMNL: Aggregating %d hours of history for groups: %s", history_window, history_groups)
+        history = HistoryAggregator(hass, timedelta(hours=history_window))
+
+    # Custom formats are compiled once here, not on every update
+    transforms = compile_value_formats(hass, value_formats or {})
+    if transforms:
+        _LOGGER.debug("TRMNL: Using custom formats for: %s", list(transforms))
+
+    # Keep a live payload cache for the groups of this entry, entities are
+    # formatted once in the snapshot shared by all entries
+    builder = SensorGroupPayloadBuilder(
+        hass,
+        label_index,
+        snapshot,
+        sensor_groups,
+        history,
+        history_groups,
+        priority_label,
+        transforms,
+        areas,
+        domains,
+    )
+    builder.async_start()
+    hass.data[DOMAIN][entry.entry_id]["builder"] = builder
+
+    # Reused across updates so only changed entities are measured
+    encoding = PAYLOAD_ENCODINGS[payload_schema]()
+    build_lock = asyncio.Lock()
+
+    def pack_payload(
+        grouped_payload: dict[str, list[dict]], priorities: dict[str, list[int]], timestamp: str
+    ) -> tuple[PackResult, dict, bytes, str]:
+        """Pack, build and encode a payload, safe to run in the executor."""
+        result = pack_grouped_payload(
+            grouped_payload, timestamp, max_payload_size, priorities, encoding=encoding
+        )
+        payload = build_payload(result.grouped_payload, timestamp, encoding=encoding)
+        return result, payload, encode_payload(payload), payload_fingerprint(payload)
+
+    def preview_payload(
+        grouped_payload: dict[str, list[dict]], priorities: dict[str, list[int]], timestamp: str
+    ) -> tuple[PackResult, dict, bytes, dict[str, float]]:
+        """Pack and encode a payload like pack_payload, timing each stage."""
+        # A fresh encoding leaves the memoized sizes of the updates alone
+        preview_encoding = PAYLOAD_ENCODINGS[payload_schema]()
+        start = time.perf_counter()
+        result = pack_grouped_payload(
+            grouped_payload, timestamp, max_payload_size, priorities, encoding=preview_encoding
+        )
+        packed = time.perf_counter()
+        payload = build_payload(result.grouped_payload, timestamp, encoding=preview_encoding)
+        body = encode_payload(payload)
+        serialized = time.perf_counter()
+        return result, payload, body, {
+            "packing": (packed - start) * 1000,
+            "serialization": (serialized - packed) * 1000,
+        }
+
+    async def async_preview() -> dict[str, Any]:
+        """Run the update pipeline without pushing and profile its stages."""
+        start = time.perf_counter()
+        timings = builder.async_profile()
+        build_start = time.perf_counter()
+        grouped_payload, priorities = builder.async_build_grouped_payload()
+        timings["build"] = (time.perf_counter() - build_start) * 1000
+        total_entities = sum(len(entities) for entities in grouped_payload.values())
+
+        timestamp = datetime.now().isoformat()
+        if total_entities >= EXECUTOR_BUILD_THRESHOLD:
+            result, payload, body, pack_timings = await hass.async_add_executor_job(
+                preview_payload, grouped_payload, priorities, timestamp
+            )
+        else:
+            result, payload, body, pack_timings = preview_payload(
+                grouped_payload, priorities, timestamp
+            )
+        timings.update(pack_timings)
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        # Names of the entities that did not fit, per group
+        truncated = {}
+        for group, entities in grouped_payload.items():
+            kept = {id(entity) for entity in result.grouped_payload.get(group, ())}
+            if dropped := [entity.get("name") for entity in entities if id(entity) not in kept]:
+                truncated[group] = dropped
+
+        return {
+            "payload": payload,
+            "size": len(body),
+            "size_before_truncation": result.full_size,
+            "max_size": max_payload_size,
+            "entities": total_entities,
+            "entities_dropped": result.dropped,
+            "truncated": truncated,
+            "unchanged": payload_fingerprint(payload) == entry_data["last_fingerprint"],
+            "timings_ms": {stage: round(duration, 3) for stage, duration in timings.items()},
+        }
 
     async def process_sensor_groups(*_):
         """Find and process entities from configured sensor groups."""
         _LOGGER.debug("TRMNL: Starting entity processing for groups: %s", sensor_groups)
+        start = time.perf_counter()
+        metrics.label_resolution_duration = builder.resolve_duration
         
-        # Create grouped payload structure
-        grouped_payload = {}
-        total_entities = 0
-        
-        for group in sensor_groups:
-            _LOGGER.debug("TRMNL: Processing group: %s", group)
-            template_str = f"{{{{ label_entities('{group}') }}}}"
-            template = Template(template_str, hass)
-            
-            try:
-                group_entities = template.async_render()
-                if not group_entities:
-                    _LOGGER.debug("TRMNL: No entities found in group '%s'", group)
-                    continue
-                
-                # Process entities in this group
-                group_payload = []
-                for entity_id in group_entities:
-                    state = hass.states.get(entity_id)
-                    if state and state.state not in ['unknown', 'unavailable']:
-                        _LOGGER.debug("TRMNL: Processing entity: %s in group %s", entity_id, group)
-                        group_payload.append(create_minimal_entity_payload(state))
-                    else:
-                        _LOGGER.debug("TRMNL: Skipping entity %s (state: %s)", entity_id, state.state if state else "not found")
-                
-                # Add group to payload if it has entities
-                if group_payload:
-                    grouped_payload[group] = group_payload
-                    total_entities += len(group_payload)
-                    _LOGGER.debug("TRMNL: Added %d entities to group '%s'", len(group_payload), group)
-                
-            except Exception as err:
-                _LOGGER.error("TRMNL: Error processing group '%s': %s", group, err)
+        # Collect the live per-group payloads kept up to date by state changes
+        grouped_payload, priorities = builder.async_build_grouped_payload()
+        total_entities = sum(len(entities) for entities in grouped_payload.values())
 
         # If no entities found, log error and return
         if not grouped_payload:
@@ -154,102 +299,148 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
         # Send to TRMNL webhook if we have entities
         if grouped_payload:
-            # Create base payload with grouped structure
-            payload = {
-                "merge_variables": {
-                    **grouped_payload,  # Spread the grouped data directly
-                    "timestamp": datetime.now().isoformat(),
-                    "total_count": total_entities,
-                    "groups": list(grouped_payload.keys())
-                }
-            }
-            
-            # Check payload size and handle truncation if needed
-            payload_size = calculate_payload_size(payload)
-            _LOGGER.debug("TRMNL: Payload size: %d bytes", payload_size)
-            
-            if payload_size > MAX_PAYLOAD_SIZE:
-                _LOGGER.warning("TRMNL: Payload size (%d bytes) exceeds 2KB limit, truncating groups", payload_size)
-                
-                # Remove entities from groups until we're under the limit
-                while payload_size > MAX_PAYLOAD_SIZE and any(grouped_payload.values()):
-                    # Find the group with the most entities and remove one
-                    largest_group = max(grouped_payload.keys(), key=lambda g: len(grouped_payload[g]))
-                    if grouped_payload[largest_group]:
-                        grouped_payload[largest_group].pop()
-                        # Remove empty groups
-                        if not grouped_payload[largest_group]:
-                            del grouped_payload[largest_group]
-                        
-                        # Update payload
-                        payload["merge_variables"] = {
-                            **grouped_payload,
-                            "timestamp": datetime.now().isoformat(),
-                            "total_count": sum(len(entities) for entities in grouped_payload.values()),
-                            "groups": list(grouped_payload.keys())
-                        }
-                        payload_size = calculate_payload_size(payload)
-                    else:
-                        break
-                
-                _LOGGER.info("TRMNL: Reduced payload to %d entities (%d bytes)", 
-                           sum(len(entities) for entities in grouped_payload.values()), payload_size)
-            
+            # Fit the grouped payload into the size limit in a single pass and
+            # serialize it once, large payloads are built in the executor
+            timestamp = datetime.now().isoformat()
+            async with build_lock:
+                if total_entities >= EXECUTOR_BUILD_THRESHOLD:
+                    result, payload, body, fingerprint = await hass.async_add_executor_job(
+                        pack_payload, grouped_payload, priorities, timestamp
+                    )
+                else:
+                    result, payload, body, fingerprint = pack_payload(
+                        grouped_payload, priorities, timestamp
+                    )
+            _LOGGER.debug("TRMNL: Payload size: %d bytes", result.full_size)
+
+            if result.dropped:
+                _LOGGER.warning("TRMNL: Payload size (%d bytes) exceeds %d byte limit, truncating groups",
+                                result.full_size, max_payload_size)
+                _LOGGER.info("TRMNL: Reduced payload to %d entities (%d bytes)",
+                           total_entities - result.dropped, len(body))
+
+            grouped_payload = result.grouped_payload
+
+            metrics.build_duration = (time.perf_counter() - start) * 1000
+            metrics.payload_size_before_truncation = result.full_size
+            metrics.payload_size = len(body)
+            metrics.entities_dropped = result.dropped
+
+            # Skip the push when nothing but the timestamp changed
+            if fingerprint == entry_data["last_fingerprint"]:
+                entry_data["unchanged_updates"] += 1
+                if not force_refresh_intervals or entry_data["unchanged_updates"] < force_refresh_intervals:
+                    _LOGGER.debug("TRMNL: Payload unchanged, skipping push (%d unchanged updates)",
+                                  entry_data["unchanged_updates"])
+                    metrics.skipped_unchanged += 1
+                    metrics.async_update_listeners()
+                    return
+                _LOGGER.debug("TRMNL: Payload unchanged for %d updates, forcing refresh",
+                              entry_data["unchanged_updates"])
+
             _LOGGER.debug("TRMNL: Preparing to send grouped payload with %d groups", len(grouped_payload))
             
-            try:
-                async with aiohttp.ClientSession() as session:
-                    _LOGGER.debug("TRMNL: Sending POST request to %s", url)
-                    async with session.post(url, json=payload, timeout=30) as response:
-                        if response.status == 200:
-                            _LOGGER.info("TRMNL: Successfully sent %d entities from %d groups", 
-                                       sum(len(entities) for entities in grouped_payload.values()), len(grouped_payload))
-                            response_text = await response.text()
-                            _LOGGER.debug("TRMNL: Webhook response: %s", response_text)
-                        else:
-                            _LOGGER.error("TRMNL: Error sending to webhook: HTTP %s", response.status)
-                            response_text = await response.text()
-                            _LOGGER.error("TRMNL: Response: %s", response_text)
-            except asyncio.TimeoutError:
-                _LOGGER.error("TRMNL: Timeout sending data to webhook")
-            except Exception as err:
-                _LOGGER.error("TRMNL: Failed to send data to webhook: %s", err)
+            # Hand the payload to the delivery worker, only the newest one is kept
+            metrics.async_update_listeners()
+            worker.async_enqueue(payload, body, fingerprint)
         else:
             _LOGGER.debug("TRMNL: No valid entities to send")
 
-    # Set up periodic timer
-    _LOGGER.debug("TRMNL: Setting up periodic timer for %d seconds", MIN_TIME_BETWEEN_UPDATES)
-    remove_timer = async_track_time_interval(
-        hass,
+    # Schedule periodic updates, staggered against the other entries
+    _LOGGER.debug("TRMNL: Scheduling updates every %d seconds (adaptive: %s)", update_interval, adaptive_interval)
+    remove_timer = async_get_scheduler(hass).async_add(
+        entry.entry_id,
         process_sensor_groups,
-        timedelta(seconds=MIN_TIME_BETWEEN_UPDATES)
+        update_interval,
+        adaptive_interval,
+        builder.async_pop_change_ratio,
     )
 
-    # Store the timer removal function
+    # Store the timer removal function and the update for on-demand refreshes
     hass.data[DOMAIN][entry.entry_id]["remove_timer"] = remove_timer
+    hass.data[DOMAIN][entry.entry_id]["refresh"] = process_sensor_groups
+    hass.data[DOMAIN][entry.entry_id]["preview"] = async_preview
+
+    # Push changes of priority entities right away, at most once per cooldown
+    if priority_push:
+        _LOGGER.debug("TRMNL: Pushing changes of '%s' entities within %d seconds",
+                      priority_label, PRIORITY_PUSH_COOLDOWN)
+        priority_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=PRIORITY_PUSH_COOLDOWN,
+            immediate=True,
+            function=process_sensor_groups,
+        )
+        remove_priority_listener = builder.async_add_priority_listener(
+            priority_debouncer.async_schedule_call
+        )
+
+        @callback
+        def async_stop_priority_push() -> None:
+            """Stop pushing priority changes."""
+            remove_priority_listener()
+            priority_debouncer.async_shutdown()
+
+        hass.data[DOMAIN][entry.entry_id]["stop_priority_push"] = async_stop_priority_push
+
+    # Apply option changes by reloading the entry
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
+    # Expose the performance metrics as diagnostic sensors
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Run initial scan
-    _LOGGER.debug("TRMNL: Running initial entity scan")
-    await process_sensor_groups()
+    # Run the initial scan once all entities have loaded, without holding up startup
+    async def async_initial_update(_hass: HomeAssistant) -> None:
+        """Run the initial entity scan."""
+        _LOGGER.debug("TRMNL: Running initial entity scan")
+        await process_sensor_groups()
+
+    hass.data[DOMAIN][entry.entry_id]["cancel_initial_update"] = async_at_started(
+        hass, async_initial_update
+    )
 
     _LOGGER.info("TRMNL: Integration setup completed for %d groups: %s", len(sensor_groups), sensor_groups)
     return True
 
+def _stored_data(entry_data: dict) -> dict:
+    """Return the data of an entry that survives restarts."""
+    return {
+        "fingerprint": entry_data["last_fingerprint"],
+        "payload": entry_data["last_payload"],
+    }
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
     try:
         # Remove the timer
         if entry.entry_id in hass.data[DOMAIN]:
             _LOGGER.debug("TRMNL: Removing timer and cleaning up")
+            hass.data[DOMAIN][entry.entry_id]["cancel_initial_update"]()
             hass.data[DOMAIN][entry.entry_id]["remove_timer"]()
-            hass.data[DOMAIN].pop(entry.entry_id)
+            if stop_priority_push := hass.data[DOMAIN][entry.entry_id].get("stop_priority_push"):
+                stop_priority_push()
+            hass.data[DOMAIN][entry.entry_id]["builder"].async_stop()
+            hass.data[DOMAIN][entry.entry_id]["worker"].async_stop()
+            entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+            # Write the last push now, a reload reads it before a delayed save lands
+            if entry_data["last_fingerprint"]:
+                await entry_data["store"].async_save(_stored_data(entry_data))
+            if not hass.data[DOMAIN]:
+                async_release_entity_snapshot(hass)
+                async_release_label_index(hass)
             _LOGGER.info("TRMNL: Successfully unloaded integration")
     except Exception as err:
         _LOGGER.error("TRMNL: Error unloading integration: %s", err)
         return False
     return True
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored payload of a deleted config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
+    await hass.config_entries.async_reload(entry.entry_id)
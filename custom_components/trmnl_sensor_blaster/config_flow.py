@@ -1,28 +1,130 @@
 """Config flow for TRMNL Entity Blaster integration."""
 from __future__ import annotations
 
+from collections.abc import Mapping
+from typing import Any
+
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.exceptions import HomeAssistantError
+from homeassistant.exceptions import HomeAssistantError, TemplateError
 from homeassistant.helpers import selector
 
-from .const import DOMAIN, CONF_URL, CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS
+from .const import (
+    DOMAIN,
+    CONF_URL,
+    CONF_SENSOR_GROUPS,
+    CONF_FORCE_REFRESH_INTERVALS,
+    CONF_UPDATE_INTERVAL,
+    CONF_ADAPTIVE_INTERVAL,
+    CONF_PAYLOAD_SCHEMA,
+    CONF_HISTORY_GROUPS,
+    CONF_HISTORY_WINDOW,
+    CONF_PRIORITY_LABEL,
+    CONF_PRIORITY_PUSH,
+    CONF_VALUE_FORMATS,
+    CONF_AREAS,
+    CONF_DOMAINS,
+    CONF_MAX_PAYLOAD_SIZE,
+    DEFAULT_SENSOR_GROUPS,
+    DEFAULT_FORCE_REFRESH_INTERVALS,
+    DEFAULT_ADAPTIVE_INTERVAL,
+    DEFAULT_PAYLOAD_SCHEMA,
+    DEFAULT_HISTORY_WINDOW,
+    DEFAULT_PRIORITY_PUSH,
+    MAX_HISTORY_WINDOW,
+    MAX_PAYLOAD_SIZE,
+    MIN_PAYLOAD_SIZE,
+    MIN_TIME_BETWEEN_UPDATES,
+    MIN_UPDATE_INTERVAL,
+    PAYLOAD_SCHEMAS,
+    PAYLOAD_SCHEMA_COLUMNAR,
+    COLUMNAR_ICONS_KEY,
+    RESERVED_GROUP_NAMES,
+    PRIORITY_LABEL,
+)
+from .label_index import async_get_domains, async_get_labels
+from .transform import validate_value_formats
+
+FORCE_REFRESH_INTERVALS_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=0))
+UPDATE_INTERVAL_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=MIN_UPDATE_INTERVAL))
+HISTORY_WINDOW_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_HISTORY_WINDOW))
+MAX_PAYLOAD_SIZE_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=MIN_PAYLOAD_SIZE))
 
-STEP_USER_DATA_SCHEMA = vol.Schema(
-    {
-        vol.Required(CONF_URL): str,
-        vol.Optional(CONF_SENSOR_GROUPS, default=DEFAULT_SENSOR_GROUPS): selector.SelectSelector(
+def _label_selector(available_labels: list[str], multiple: bool = True) -> selector.SelectSelector:
+    """Return a dropdown of labels that also takes label names."""
+    return selector.SelectSelector(
+        selector.SelectSelectorConfig(
+            options=available_labels,
+            mode=selector.SelectSelectorMode.DROPDOWN,
+            multiple=multiple,
+            custom_value=True,
+        )
+    )
+
+def build_schema(
+    hass: HomeAssistant,
+    defaults: Mapping[str, Any],
+    available_labels: list[str],
+    options: bool = False,
+) -> vol.Schema:
+    """Return the schema of the user step, or of the options step with options.
+
+    Both forms are built here so they show the same fields. Defaults come
+    from the submitted input, or the current options and data of an entry.
+    """
+    fields = {
+        vol.Required(CONF_URL, default=defaults.get(CONF_URL, "")): str,
+        vol.Required(
+            CONF_SENSOR_GROUPS, default=defaults.get(CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS)
+        ): _label_selector(available_labels),
+        vol.Optional(
+            CONF_FORCE_REFRESH_INTERVALS,
+            default=defaults.get(CONF_FORCE_REFRESH_INTERVALS, DEFAULT_FORCE_REFRESH_INTERVALS),
+        ): FORCE_REFRESH_INTERVALS_SCHEMA,
+        vol.Optional(
+            CONF_UPDATE_INTERVAL, default=defaults.get(CONF_UPDATE_INTERVAL, MIN_TIME_BETWEEN_UPDATES)
+        ): UPDATE_INTERVAL_SCHEMA,
+        vol.Optional(
+            CONF_ADAPTIVE_INTERVAL, default=defaults.get(CONF_ADAPTIVE_INTERVAL, DEFAULT_ADAPTIVE_INTERVAL)
+        ): bool,
+        vol.Optional(
+            CONF_PAYLOAD_SCHEMA, default=defaults.get(CONF_PAYLOAD_SCHEMA, DEFAULT_PAYLOAD_SCHEMA)
+        ): vol.In(PAYLOAD_SCHEMAS),
+        vol.Optional(
+            CONF_MAX_PAYLOAD_SIZE, default=defaults.get(CONF_MAX_PAYLOAD_SIZE, MAX_PAYLOAD_SIZE)
+        ): MAX_PAYLOAD_SIZE_SCHEMA,
+        vol.Optional(
+            CONF_HISTORY_GROUPS, default=defaults.get(CONF_HISTORY_GROUPS, [])
+        ): _label_selector(available_labels),
+        vol.Optional(
+            CONF_HISTORY_WINDOW, default=defaults.get(CONF_HISTORY_WINDOW, DEFAULT_HISTORY_WINDOW)
+        ): HISTORY_WINDOW_SCHEMA,
+        vol.Optional(
+            CONF_PRIORITY_LABEL, default=defaults.get(CONF_PRIORITY_LABEL, PRIORITY_LABEL)
+        ): _label_selector(available_labels, multiple=False),
+        vol.Optional(
+            CONF_PRIORITY_PUSH, default=defaults.get(CONF_PRIORITY_PUSH, DEFAULT_PRIORITY_PUSH)
+        ): bool,
+        vol.Optional(CONF_AREAS, default=defaults.get(CONF_AREAS, [])): selector.AreaSelector(
+            selector.AreaSelectorConfig(multiple=True)
+        ),
+        vol.Optional(CONF_DOMAINS, default=defaults.get(CONF_DOMAINS, [])): selector.SelectSelector(
             selector.SelectSelectorConfig(
-                options=[],
+                options=async_get_domains(hass),
                 mode=selector.SelectSelectorMode.DROPDOWN,
                 multiple=True,
                 custom_value=True,
             )
         ),
     }
-)
+    if options:
+        # Custom formats are only set once the entry exists
+        fields[
+            vol.Optional(CONF_VALUE_FORMATS, default=defaults.get(CONF_VALUE_FORMATS, {}))
+        ] = selector.ObjectSelector()
+    return vol.Schema(fields)
 
 async def validate_input(hass: HomeAssistant, data: dict[str, str]) -> dict[str, str]:
     """Validate the user input allows us to connect."""
@@ -35,6 +137,19 @@ async def validate_input(hass: HomeAssistant, data: dict[str, str]) -> dict[str,
     sensor_groups = data.get(CONF_SENSOR_GROUPS, [])
     if not sensor_groups:
         raise NoSensorGroups("At least one sensor group must be specified")
+
+    # Groups share the merge variables with the timestamp, count and icons
+    reserved = set(RESERVED_GROUP_NAMES)
+    if data.get(CONF_PAYLOAD_SCHEMA, DEFAULT_PAYLOAD_SCHEMA) == PAYLOAD_SCHEMA_COLUMNAR:
+        reserved.add(COLUMNAR_ICONS_KEY)
+    if reserved.intersection(sensor_groups):
+        raise ReservedGroupName(f"Sensor groups cannot be named {', '.join(sorted(reserved))}")
+
+    # Validate custom formats, they are compiled when the entry loads
+    try:
+        validate_value_formats(hass, data.get(CONF_VALUE_FORMATS) or {})
+    except (ValueError, TemplateError) as err:
+        raise InvalidFormat(str(err)) from err
     
     return {"title": f"TRMNL Blaster ({len(sensor_groups)} groups)"}
 
@@ -60,6 +175,10 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = "invalid_url"
             except NoSensorGroups:
                 errors["base"] = "no_sensor_groups"
+            except ReservedGroupName:
+                errors["base"] = "reserved_group_name"
+            except InvalidFormat:
+                errors["base"] = "invalid_format"
             except Exception:  # pylint: disable=broad-except
                 errors["base"] = "unknown"
             else:
@@ -68,23 +187,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Get available labels from Home Assistant
         available_labels = await self._get_available_labels()
         
-        # Update schema with available labels
-        schema = vol.Schema(
-            {
-                vol.Required(CONF_URL, default=user_input.get(CONF_URL, "") if user_input else ""): str,
-                vol.Required(
-                    CONF_SENSOR_GROUPS, 
-                    default=user_input.get(CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS) if user_input else DEFAULT_SENSOR_GROUPS
-                ): selector.SelectSelector(
-                    selector.SelectSelectorConfig(
-                        options=available_labels,
-                        mode=selector.SelectSelectorMode.DROPDOWN,
-                        multiple=True,
-                        custom_value=True,
-                    )
-                ),
-            }
-        )
+        schema = build_schema(self.hass, user_input or {}, available_labels)
 
         return self.async_show_form(
             step_id="user",
@@ -94,13 +197,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def _get_available_labels(self) -> list[str]:
         """Get available labels from Home Assistant."""
-        try:
-            # Get all labels from the label registry
-            label_registry = await self.hass.helpers.label_registry.async_get_registry()
-            labels = [label.label_id for label in label_registry.labels.values()]
-            return sorted(labels) if labels else DEFAULT_SENSOR_GROUPS
-        except Exception:
-            return DEFAULT_SENSOR_GROUPS
+        return async_get_labels(self.hass) or DEFAULT_SENSOR_GROUPS
 
     @staticmethod
     @callback
@@ -126,6 +223,10 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 errors["base"] = "invalid_url"
             except NoSensorGroups:
                 errors["base"] = "no_sensor_groups"
+            except ReservedGroupName:
+                errors["base"] = "reserved_group_name"
+            except InvalidFormat:
+                errors["base"] = "invalid_format"
             except Exception:  # pylint: disable=broad-except
                 errors["base"] = "unknown"
             else:
@@ -134,28 +235,11 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         # Get available labels
         available_labels = await self._get_available_labels()
         
-        schema = vol.Schema(
-            {
-                vol.Required(
-                    CONF_URL,
-                    default=self._config_entry.options.get(
-                        CONF_URL, self._config_entry.data.get(CONF_URL, "")
-                    ),
-                ): str,
-                vol.Required(
-                    CONF_SENSOR_GROUPS,
-                    default=self._config_entry.options.get(
-                        CONF_SENSOR_GROUPS, self._config_entry.data.get(CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS)
-                    ),
-                ): selector.SelectSelector(
-                    selector.SelectSelectorConfig(
-                        options=available_labels,
-                        mode=selector.SelectSelectorMode.DROPDOWN,
-                        multiple=True,
-                        custom_value=True,
-                    )
-                ),
-            }
+        schema = build_schema(
+            self.hass,
+            {**self._config_entry.data, **self._config_entry.options, **(user_input or {})},
+            available_labels,
+            options=True,
         )
 
         return self.async_show_form(
@@ -166,15 +250,16 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def _get_available_labels(self) -> list[str]:
         """Get available labels from Home Assistant."""
-        try:
-            label_registry = await self.hass.helpers.label_registry.async_get_registry()
-            labels = [label.label_id for label in label_registry.labels.values()]
-            return sorted(labels) if labels else DEFAULT_SENSOR_GROUPS
-        except Exception:
-            return DEFAULT_SENSOR_GROUPS
+        return async_get_labels(self.hass) or DEFAULT_SENSOR_GROUPS
 
 class InvalidURL(HomeAssistantError):
     """Error to indicate invalid URL format."""
 
 class NoSensorGroups(HomeAssistantError):
     """Error to indicate no sensor groups specified."""
+
+class ReservedGroupName(HomeAssistantError):
+    """Error to indicate a sensor group that collides with a merge variable."""
+
+class InvalidFormat(HomeAssistantError):
+    """Error to indicate an invalid custom format."""
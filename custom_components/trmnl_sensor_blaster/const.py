@@ -3,6 +3,54 @@ DOMAIN = "trmnl_sensor_blaster"
 CONF_URL = "url"
 CONF_SENSOR_GROUPS = "sensor_groups"
 DEFAULT_URL = "https://usetrmnl.com/api/custom_plugins/XXXX-XXXX-XXXX-XXXX"  # Example URL
-MIN_TIME_BETWEEN_UPDATES = 1800  # 30 minutes in seconds
-MAX_PAYLOAD_SIZE = 2048  # 2KB limit for TRMNL API
+CONF_UPDATE_INTERVAL = "update_interval"
+CONF_ADAPTIVE_INTERVAL = "adaptive_interval"
+MIN_TIME_BETWEEN_UPDATES = 1800  # 30 minutes in seconds, default update interval
+MIN_UPDATE_INTERVAL = 60  # Shortest update interval in seconds
+DEFAULT_ADAPTIVE_INTERVAL = False
+ADAPTIVE_INTERVAL_FACTOR = 4  # Adaptive mode stays within interval / 4 and interval * 4
+ADAPTIVE_BUSY_RATIO = 0.25  # Share of changed entities that shortens the adaptive interval
+UPDATE_STAGGER = 5  # Seconds between updates of different entries
+MAX_PAYLOAD_SIZE = 2048  # 2KB limit for TRMNL API, the default payload budget
+CONF_MAX_PAYLOAD_SIZE = "max_payload_size"  # Per-entry budget for plans with a larger limit
+MIN_PAYLOAD_SIZE = 512  # Smallest budget that still fits a few entities
+EXECUTOR_BUILD_THRESHOLD = 1000  # Entities from which payloads are built in the executor
+WEBHOOK_TIMEOUT = 30  # Seconds before a webhook request is abandoned
+MAX_CONNECTIONS_PER_HOST = 4  # Concurrent webhook requests per TRMNL host
+RETRY_BASE_DELAY = 2  # Seconds before the first retry of a failed push
+RETRY_MAX_DELAY = 300  # Upper bound of the retry backoff in seconds
+CIRCUIT_BREAKER_THRESHOLD = 5  # Consecutive failures before deliveries are paused
+CIRCUIT_BREAKER_COOLDOWN = 900  # Seconds deliveries stay paused once the circuit opens
+METRICS_LATENCY_SAMPLES = 100  # Recent POST latencies kept for percentiles
 DEFAULT_SENSOR_GROUPS = ["TRMNL"]  # Backward compatibility
+CONF_PAYLOAD_SCHEMA = "payload_schema"
+PAYLOAD_SCHEMA_STANDARD = "standard"  # [{"name", "value", "icon"}] per group
+PAYLOAD_SCHEMA_COMPACT = "compact"  # [{"n", "v", "i"}] per group
+PAYLOAD_SCHEMA_COLUMNAR = "columnar"  # {"n": [...], "v": [...], "i": [...]} per group with shared icons
+PAYLOAD_SCHEMAS = [PAYLOAD_SCHEMA_STANDARD, PAYLOAD_SCHEMA_COMPACT, PAYLOAD_SCHEMA_COLUMNAR]
+DEFAULT_PAYLOAD_SCHEMA = PAYLOAD_SCHEMA_STANDARD
+COLUMNAR_ICONS_KEY = "icons"  # Shared icon list of the columnar schema
+RESERVED_GROUP_NAMES = ("timestamp", "total_count", "groups")  # Merge variables next to the groups
+PRIORITY_LABEL = "trmnl_priority"  # Entities with this label are kept first when truncating
+CONF_PRIORITY_LABEL = "priority_label"
+CONF_PRIORITY_PUSH = "priority_push"
+DEFAULT_PRIORITY_PUSH = False
+PRIORITY_PUSH_COOLDOWN = 300  # Minimum seconds between pushes triggered by priority entities
+CONF_FORCE_REFRESH_INTERVALS = "force_refresh_intervals"
+DEFAULT_FORCE_REFRESH_INTERVALS = 12  # Push unchanged content at least every 12 updates (0 = never)
+CONF_HISTORY_GROUPS = "history_groups"
+CONF_HISTORY_WINDOW = "history_window"
+DEFAULT_HISTORY_WINDOW = 24  # Hours of history aggregated for history groups
+MAX_HISTORY_WINDOW = 168  # One week
+HISTORY_SPARKLINE_POINTS = 12  # Buckets per history window, one sparkline point each
+CONF_AREAS = "areas"  # Only show group entities in these areas (empty = all)
+CONF_DOMAINS = "domains"  # Only show group entities of these domains (empty = all)
+CONF_VALUE_FORMATS = "value_formats"  # Group label or entity id -> {"name": format, "value": format}
+SERVICE_PREVIEW = "preview"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10  # Seconds to coalesce writes of the last pushed payload
+DATA_LABEL_INDEX = f"{DOMAIN}_label_index"
+DATA_WEBHOOK_CLIENT = f"{DOMAIN}_webhook_client"
+DATA_SCHEDULER = f"{DOMAIN}_scheduler"
+DATA_ENTITY_SNAPSHOT = f"{DOMAIN}_entity_snapshot"
@@ -0,0 +1,30 @@
+"""Diagnostics support for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_URL, DOMAIN
+
+# The webhook URL contains the plugin UUID, which grants write access
+TO_REDACT = {CONF_URL}
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": {
+            "title": entry.title,
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "groups": entry_data["builder"].async_group_sizes(),
+        "unchanged_updates": entry_data["unchanged_updates"],
+        "last_payload": entry_data["last_payload"],
+        "metrics": entry_data["metrics"].as_dict(),
+    }
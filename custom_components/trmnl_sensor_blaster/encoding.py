@@ -0,0 +1,193 @@
+"""Payload encodings for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.helpers.json import json_bytes
+
+from .const import (
+    COLUMNAR_ICONS_KEY,
+    PAYLOAD_SCHEMA_COLUMNAR,
+    PAYLOAD_SCHEMA_COMPACT,
+    PAYLOAD_SCHEMA_STANDARD,
+)
+
+def json_size(value) -> int:
+    """Return the size of a value serialized like calculate_payload_size does."""
+    return len(json_bytes(value))
+
+class PayloadEncoding:
+    """Encode every entity as a `{"name", "value", "icon"}` object.
+
+    Besides encoding, an encoding knows the byte cost of its parts so the
+    packer can size a payload without serializing it. A group costs
+    group_cost for its first entity on top of the entity cost, every further
+    entity adds separator_cost.
+
+    Entity costs are memoized by entity identity, so an instance reused for
+    every update only measures entities whose payload changed.
+    """
+
+    separator_cost = 1
+    shared_icons = False
+
+    def __init__(self) -> None:
+        """Initialize the encoding."""
+        # Costs of the entities of the current and previous payload
+        self._costs: dict[int, tuple[dict, int]] = {}
+        self._previous_costs: dict[int, tuple[dict, int]] = {}
+
+    def prepare(self, grouped_payload: dict[str, list[dict]]) -> None:
+        """Prepare the size accounting for a grouped payload."""
+        # Costs of entities that left the payload are dropped after one update
+        self._previous_costs, self._costs = self._costs, {}
+
+    def _memoized_cost(self, entity: dict, cost_fn: Callable[[dict], int]) -> int:
+        """Return cost_fn(entity), reusing the cost from earlier payloads."""
+        # Cached entities are referenced, so their ids cannot be reused
+        key = id(entity)
+        if (cached := self._costs.get(key)) is None:
+            if (cached := self._previous_costs.get(key)) is None:
+                cached = (entity, cost_fn(entity))
+            self._costs[key] = cached
+        return cached[1]
+
+    def encode(self, grouped_payload: dict[str, list[dict]]) -> dict[str, Any]:
+        """Return the merge variables holding the grouped entities."""
+        return dict(grouped_payload)
+
+    def group_cost(self, group: str) -> int:
+        """Return the cost of `"group":[],` and `"group"` in the groups list."""
+        return 2 * json_size(group) + 4
+
+    def entity_cost(self, entity: dict, group: str) -> int:
+        """Return the cost of a single entity of a group."""
+        return self._memoized_cost(entity, json_size)
+
+    def icon_cost(self, icon: str) -> int:
+        """Return the cost of adding an icon to the shared icon list."""
+        return 0
+
+class CompactPayloadEncoding(PayloadEncoding):
+    """Encode every entity as an `{"n", "v", "i"}` object.
+
+    History aggregates are abbreviated to `lo`, `hi`, `av` and `s`.
+    """
+
+    KEYS = {
+        "name": "n",
+        "value": "v",
+        "icon": "i",
+        "min": "lo",
+        "max": "hi",
+        "avg": "av",
+        "spark": "s",
+    }
+
+    def _encode_entity(self, entity: dict) -> dict:
+        """Abbreviate the keys of an entity."""
+        return {self.KEYS[key]: value for key, value in entity.items()}
+
+    def encode(self, grouped_payload: dict[str, list[dict]]) -> dict[str, Any]:
+        """Return the merge variables holding the grouped entities."""
+        return {
+            group: [self._encode_entity(entity) for entity in entities]
+            for group, entities in grouped_payload.items()
+        }
+
+    def entity_cost(self, entity: dict, group: str) -> int:
+        """Return the cost of a single entity of a group."""
+        return self._memoized_cost(entity, lambda entity: json_size(self._encode_entity(entity)))
+
+class ColumnarPayloadEncoding(PayloadEncoding):
+    """Encode every group as `{"n": [...], "v": [...], "i": [...]}` columns.
+
+    Icons are stored once in a shared `icons` list and referenced by index,
+    entities without an icon have a null index. Groups with history
+    aggregates get an `"h"` column of `[min, max, avg, sparkline]` entries,
+    null for entities without numeric history.
+    """
+
+    # Commas between the entries of the three columns
+    separator_cost = 3
+    shared_icons = True
+
+    def __init__(self) -> None:
+        """Initialize the encoding."""
+        super().__init__()
+        # Width of the index every icon gets in the full payload
+        self._index_sizes: dict[str, int] = {}
+        self._history_groups: set[str] = set()
+
+    @staticmethod
+    def _history(entity: dict) -> list | None:
+        """Return the history column entry of an entity."""
+        if "spark" not in entity:
+            return None
+        return [entity["min"], entity["max"], entity["avg"], entity["spark"]]
+
+    def prepare(self, grouped_payload: dict[str, list[dict]]) -> None:
+        """Size the icon index of every icon in the order encode assigns them.
+
+        Dropping entities can only move an icon to a lower index, so the
+        widths are exact for the full payload and an upper bound otherwise.
+        """
+        super().prepare(grouped_payload)
+        self._history_groups = {
+            group
+            for group, entities in grouped_payload.items()
+            if any("spark" in entity for entity in entities)
+        }
+        icons: dict[str, int] = {}
+        for entities in grouped_payload.values():
+            for entity in entities:
+                if "icon" in entity:
+                    icons.setdefault(entity["icon"], len(icons))
+        self._index_sizes = {icon: len(str(index)) for icon, index in icons.items()}
+
+    def encode(self, grouped_payload: dict[str, list[dict]]) -> dict[str, Any]:
+        """Return the merge variables holding the grouped entities."""
+        icons: dict[str, int] = {}
+        variables: dict[str, Any] = {}
+        for group, entities in grouped_payload.items():
+            variables[group] = {
+                "n": [entity["name"] for entity in entities],
+                "v": [entity["value"] for entity in entities],
+                "i": [
+                    icons.setdefault(entity["icon"], len(icons)) if "icon" in entity else None
+                    for entity in entities
+                ],
+            }
+            if any("spark" in entity for entity in entities):
+                variables[group]["h"] = [self._history(entity) for entity in entities]
+        variables[COLUMNAR_ICONS_KEY] = list(icons)
+        return variables
+
+    def group_cost(self, group: str) -> int:
+        """Return the cost of `"group":{"n":[],"v":[],"i":[]},` and `"group"`."""
+        cost = 2 * json_size(group) + 24
+        if group in self._history_groups:
+            cost += 6  # ,"h":[]
+        return cost
+
+    def entity_cost(self, entity: dict, group: str) -> int:
+        """Return the cost of a single entity of a group."""
+        icon_size = self._index_sizes[entity["icon"]] if "icon" in entity else 4  # null
+        cost = icon_size + self._memoized_cost(
+            entity, lambda entity: json_size(entity["name"]) + json_size(entity["value"])
+        )
+        if group in self._history_groups:
+            # Comma and entry in the history column, null without history
+            cost += 1 + json_size(self._history(entity))
+        return cost
+
+    def icon_cost(self, icon: str) -> int:
+        """Return the cost of adding an icon to the shared icon list."""
+        return json_size(icon)
+
+PAYLOAD_ENCODINGS: dict[str, type[PayloadEncoding]] = {
+    PAYLOAD_SCHEMA_STANDARD: PayloadEncoding,
+    PAYLOAD_SCHEMA_COMPACT: CompactPayloadEncoding,
+    PAYLOAD_SCHEMA_COLUMNAR: ColumnarPayloadEncoding,
+}
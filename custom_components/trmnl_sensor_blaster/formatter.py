@@ -0,0 +1,92 @@
+"""Entity formatting for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from homeassistant.core import State
+
+IGNORED_STATES = ("unknown", "unavailable")
+
+class EntityFormatRule:
+    """Formatting decisions for an entity, compiled from its attributes."""
+
+    __slots__ = ("attributes", "name", "unit", "icon")
+
+    def __init__(self, state: State) -> None:
+        """Compile the rule from the attributes of a state."""
+        attributes = state.attributes
+        self.attributes: Mapping[str, Any] = attributes
+        # Use friendly name if available, otherwise use entity_id
+        self.name: str = attributes.get('friendly_name', state.entity_id.split('.')[-1])
+        self.unit: str | None = attributes.get('unit_of_measurement')
+        self.icon: str | None = attributes.get('icon')
+
+    def format_value(self, value: str) -> str:
+        """Format a state value with the unit of the entity."""
+        unit = self.unit
+        if not unit or value in IGNORED_STATES:
+            return value
+        try:
+            # Try to format numeric values nicely
+            float_val = float(value)
+        except (ValueError, TypeError):
+            # If not numeric, just append unit
+            return f"{value}{unit}"
+        if float_val.is_integer():
+            return f"{int(float_val)}{unit}"
+        return f"{float_val:.1f}{unit}"
+
+    def payload(self, value: str) -> dict:
+        """Return the minimal payload for a state value."""
+        payload = {
+            "name": self.name,
+            "value": self.format_value(value)
+        }
+        # Add icon if available
+        if self.icon:
+            payload["icon"] = self.icon
+        return payload
+
+class EntityFormatter:
+    """Memoize minimal entity payloads.
+
+    Payloads are cached per entity against the state object they were made
+    from, so an unchanged entity costs a single dict lookup. Rules are
+    recompiled only when the attributes of the entity change.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the formatter."""
+        self._payloads: dict[str, tuple[State, dict | None]] = {}
+        self._rules: dict[str, EntityFormatRule] = {}
+
+    def format(self, state: State | None) -> dict | None:
+        """Return the payload for a state, or None if it should be skipped."""
+        if state is None:
+            return None
+        entity_id = state.entity_id
+        if (cached := self._payloads.get(entity_id)) is not None and cached[0] is state:
+            return cached[1]
+
+        payload = None
+        if state.state not in IGNORED_STATES:
+            payload = self.rule(state).payload(state.state)
+
+        self._payloads[entity_id] = (state, payload)
+        return payload
+
+    def rule(self, state: State) -> EntityFormatRule:
+        """Return the formatting rule for a state, compiling it when needed."""
+        rule = self._rules.get(state.entity_id)
+        # States share their attributes object while the attributes are unchanged
+        if rule is None or rule.attributes is not state.attributes:
+            rule = self._rules[state.entity_id] = EntityFormatRule(state)
+        return rule
+
+    def retain(self, entity_ids: Iterable[str]) -> None:
+        """Evict every entity that is not in entity_ids."""
+        keep = set(entity_ids)
+        for cache in (self._payloads, self._rules):
+            for entity_id in cache.keys() - keep:
+                del cache[entity_id]
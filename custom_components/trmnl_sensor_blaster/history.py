@@ -0,0 +1,245 @@
+"""History aggregation for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from datetime import timedelta
+import logging
+import math
+import time
+from typing import Any
+
+from homeassistant.components.recorder import get_instance, history
+from homeassistant.const import (
+    COMPRESSED_STATE_LAST_CHANGED,
+    COMPRESSED_STATE_LAST_UPDATED,
+    COMPRESSED_STATE_STATE,
+)
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import dt as dt_util
+
+from .const import HISTORY_SPARKLINE_POINTS
+
+_LOGGER = logging.getLogger(__name__)
+
+def _float(value: str) -> float | None:
+    """Return a state as a finite number, or None if it is not numeric."""
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return None
+    return number if math.isfinite(number) else None
+
+def _number(value: float) -> float | int:
+    """Round a number like format_value does and drop a zero fraction."""
+    rounded = round(value, 1)
+    return int(rounded) if rounded.is_integer() else rounded
+
+class RollingAggregate:
+    """Samples of an entity folded into fixed time buckets.
+
+    Every bucket keeps the min, max, sum, count and latest sample, so memory
+    is bounded by the number of buckets however often the entity changes.
+    """
+
+    __slots__ = ("buckets", "carry", "carry_time")
+
+    def __init__(self) -> None:
+        """Initialize the aggregate."""
+        # bucket -> [min, max, sum, count, latest value, latest timestamp]
+        self.buckets: dict[int, list[float]] = {}
+        # Latest sample before the oldest bucket, fills gaps at the start
+        self.carry: float | None = None
+        self.carry_time = 0.0
+
+    def add(self, bucket: int, first_bucket: int, timestamp: float, value: float) -> None:
+        """Add a sample to its bucket."""
+        if bucket < first_bucket:
+            if timestamp >= self.carry_time:
+                self.carry, self.carry_time = value, timestamp
+            return
+        if (stats := self.buckets.get(bucket)) is None:
+            self.buckets[bucket] = [value, value, value, 1, value, timestamp]
+            return
+        if value < stats[0]:
+            stats[0] = value
+        if value > stats[1]:
+            stats[1] = value
+        stats[2] += value
+        stats[3] += 1
+        if timestamp >= stats[5]:
+            stats[4], stats[5] = value, timestamp
+
+    def prune(self, first_bucket: int) -> None:
+        """Fold the buckets older than first_bucket into the carried sample."""
+        for bucket in sorted(bucket for bucket in self.buckets if bucket < first_bucket):
+            stats = self.buckets.pop(bucket)
+            if stats[5] >= self.carry_time:
+                self.carry, self.carry_time = stats[4], stats[5]
+
+    def aggregate(self, first_bucket: int, points: int) -> dict[str, Any] | None:
+        """Return min, max, average and sparkline over the buckets.
+
+        A bucket without samples holds the latest value before it. The
+        average is taken over the sparkline points so it is weighted by time
+        rather than by the number of samples.
+        """
+        spark: list[float] = []
+        low = high = last = self.carry
+        for bucket in range(first_bucket, first_bucket + points):
+            if (stats := self.buckets.get(bucket)) is not None:
+                spark.append(stats[2] / stats[3])
+                low = stats[0] if low is None else min(low, stats[0])
+                high = stats[1] if high is None else max(high, stats[1])
+                last = stats[4]
+            elif last is not None:
+                spark.append(last)
+        if not spark:
+            return None
+        return {
+            "min": _number(low),
+            "max": _number(high),
+            "avg": _number(sum(spark) / len(spark)),
+            "spark": [_number(value) for value in spark],
+        }
+
+class HistoryAggregator:
+    """Aggregate the recent history of entities for sparkline payloads.
+
+    New entities are seeded with one batched recorder query, after that the
+    rolling aggregates are fed from state change events so the database is
+    not queried on updates.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, window: timedelta, points: int = HISTORY_SPARKLINE_POINTS
+    ) -> None:
+        """Initialize the aggregator."""
+        self.hass = hass
+        self.window = window
+        self.points = points
+        self.bucket_size = window.total_seconds() / points
+        self._aggregates: dict[str, RollingAggregate] = {}
+        self._seed_tasks: set[asyncio.Task] = set()
+        self._unsub_state: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following entities."""
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        for task in self._seed_tasks:
+            task.cancel()
+        self._aggregates = {}
+
+    @callback
+    def async_set_entities(self, entity_ids: Iterable[str]) -> None:
+        """Follow the history of entity_ids, seeding new ones from the recorder."""
+        entity_ids = set(entity_ids)
+        removed = self._aggregates.keys() - entity_ids
+        new = entity_ids - self._aggregates.keys()
+        if not removed and not new:
+            return
+        for entity_id in removed:
+            del self._aggregates[entity_id]
+        for entity_id in new:
+            self._aggregates[entity_id] = RollingAggregate()
+
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        if entity_ids:
+            self._unsub_state = async_track_state_change_event(
+                self.hass, list(entity_ids), self._async_state_changed
+            )
+        if new:
+            task = self.hass.async_create_background_task(
+                self._async_seed(sorted(new)), "trmnl history seed"
+            )
+            self._seed_tasks.add(task)
+            task.add_done_callback(self._seed_tasks.discard)
+
+    @callback
+    def async_aggregate(self, entity_id: str) -> dict[str, Any] | None:
+        """Return the aggregate of an entity, or None without numeric history."""
+        if (aggregate := self._aggregates.get(entity_id)) is None:
+            return None
+        first_bucket = self._first_bucket(time.time())
+        aggregate.prune(first_bucket)
+        return aggregate.aggregate(first_bucket, self.points)
+
+    def _first_bucket(self, now: float) -> int:
+        """Return the oldest bucket of the window ending at now."""
+        return int(now // self.bucket_size) - self.points + 1
+
+    @callback
+    def _async_add(self, aggregate: RollingAggregate, timestamp: float, state: str) -> None:
+        """Add a state sample to an aggregate."""
+        if (value := _float(state)) is None:
+            return
+        first_bucket = self._first_bucket(time.time())
+        aggregate.add(int(timestamp // self.bucket_size), first_bucket, timestamp, value)
+        # Keep memory bounded for entities that are not read for a while
+        if len(aggregate.buckets) > self.points:
+            aggregate.prune(first_bucket)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Add a new state to the aggregate of its entity."""
+        if (new_state := event.data["new_state"]) is None:
+            return
+        if (aggregate := self._aggregates.get(event.data["entity_id"])) is not None:
+            self._async_add(aggregate, new_state.last_updated_timestamp, new_state.state)
+
+    async def _async_seed(self, entity_ids: list[str]) -> None:
+        """Seed new aggregates with one recorder query for all entities."""
+        end_time = dt_util.utcnow()
+        if "recorder" not in self.hass.config.components:
+            # Without history start from the current states
+            for entity_id in entity_ids:
+                if (state := self.hass.states.get(entity_id)) and (
+                    aggregate := self._aggregates.get(entity_id)
+                ):
+                    self._async_add(aggregate, state.last_updated_timestamp, state.state)
+            return
+
+        start = time.perf_counter()
+        try:
+            states = await get_instance(self.hass).async_add_executor_job(
+                self._get_history, entity_ids, end_time - self.window, end_time
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("TRMNL: Could not load history for %d entities: %s", len(entity_ids), err)
+            return
+
+        # Samples after end_time arrive as state changes
+        end = end_time.timestamp()
+        for entity_id, rows in states.items():
+            if (aggregate := self._aggregates.get(entity_id)) is None:
+                continue
+            for row in rows:
+                timestamp = row.get(COMPRESSED_STATE_LAST_UPDATED) or row[COMPRESSED_STATE_LAST_CHANGED]
+                if timestamp < end:
+                    self._async_add(aggregate, timestamp, row[COMPRESSED_STATE_STATE])
+        _LOGGER.debug(
+            "TRMNL: Seeded history of %d entities in %.1f ms",
+            len(entity_ids),
+            (time.perf_counter() - start) * 1000,
+        )
+
+    def _get_history(
+        self, entity_ids: list[str], start_time, end_time
+    ) -> dict[str, list[dict[str, Any]]]:
+        """Load the states of entities in the window, runs in the recorder executor."""
+        return history.get_significant_states(
+            self.hass,
+            start_time,
+            end_time,
+            entity_ids,
+            significant_changes_only=False,
+            minimal_response=True,
+            no_attributes=True,
+            compressed_state_format=True,
+        )
@@ -0,0 +1,254 @@
+"""Shared label to entity index for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback, split_entity_id
+from homeassistant.helpers import (
+    device_registry as dr,
+    entity_registry as er,
+    label_registry as lr,
+)
+
+from .const import DATA_LABEL_INDEX
+
+_LOGGER = logging.getLogger(__name__)
+
+# Entity registry changes that can move an entity in or out of a group
+INDEXED_CHANGES = ("labels", "area_id", "device_id")
+
+class LabelIndex:
+    """Map label ids to entity ids for all config entries.
+
+    The index is built once from the entity and device registries and
+    patched from registry update events, so looking up a group is a dict
+    access instead of a template render. Labelled entities are also indexed
+    by area and domain, so area and domain filters are set intersections.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the index."""
+        self.hass = hass
+        # Dicts are used as ordered sets to keep the registry order
+        self._label_entities: dict[str, dict[str, None]] = {}
+        self._entity_labels: dict[str, set[str]] = {}
+        # Area, domain and device of the labelled entities
+        self._area_entities: dict[str | None, set[str]] = {}
+        self._domain_entities: dict[str, set[str]] = {}
+        self._device_entities: dict[str, set[str]] = {}
+        self._entity_places: dict[str, tuple[str | None, str, str | None]] = {}
+        # Filtered lookups, cleared whenever the index changes
+        self._filtered: dict[tuple[str, frozenset[str], frozenset[str]], list[str]] = {}
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._unsub_registry: CALLBACK_TYPE | None = None
+        self._unsub_devices: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Build the index and start listening for registry updates."""
+        ent_reg = er.async_get(self.hass)
+        for entry in ent_reg.entities.values():
+            self._add(entry)
+        self._unsub_registry = self.hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_registry_updated
+        )
+        self._unsub_devices = self.hass.bus.async_listen(
+            dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated
+        )
+        _LOGGER.debug("TRMNL: Indexed %d labels", len(self._label_entities))
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for registry updates."""
+        if self._unsub_registry:
+            self._unsub_registry()
+            self._unsub_registry = None
+        if self._unsub_devices:
+            self._unsub_devices()
+            self._unsub_devices = None
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[set[str]], None]) -> CALLBACK_TYPE:
+        """Listen for membership changes, called with the affected label ids."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_resolve_label(self, label: str) -> str:
+        """Return the label id for a label id or name, like label_entities does."""
+        label_reg = lr.async_get(self.hass)
+        if label_reg.async_get_label(label) is None and (
+            entry := label_reg.async_get_label_by_name(label)
+        ):
+            return entry.label_id
+        return label
+
+    @callback
+    def async_get_entities(
+        self,
+        label: str,
+        areas: Iterable[str] | None = None,
+        domains: Iterable[str] | None = None,
+        cached: bool = True,
+    ) -> list[str]:
+        """Return the entity ids carrying a label id or name.
+
+        With areas or domains only entities in one of those areas and one of
+        those domains are returned. The area of an entity is its own area or
+        else the area of its device. Filtered lookups are cached until the
+        index changes, pass cached=False to recompute them.
+        """
+        label = self.async_resolve_label(label)
+        entities = self._label_entities.get(label, {})
+        if not areas and not domains:
+            return list(entities)
+
+        key = (label, frozenset(areas or ()), frozenset(domains or ()))
+        if not cached or (result := self._filtered.get(key)) is None:
+            allowed: set[str] | None = None
+            if key[1]:
+                allowed = set().union(*(self._area_entities.get(area, ()) for area in key[1]))
+            if key[2]:
+                in_domains = set().union(
+                    *(self._domain_entities.get(domain, ()) for domain in key[2])
+                )
+                allowed = in_domains if allowed is None else allowed & in_domains
+            result = self._filtered[key] = [
+                entity_id for entity_id in entities if entity_id in allowed
+            ]
+        return list(result)
+
+    @callback
+    def async_get_groups(
+        self,
+        groups: Iterable[str],
+        areas: Iterable[str] | None = None,
+        domains: Iterable[str] | None = None,
+        cached: bool = True,
+    ) -> dict[str, list[str]]:
+        """Return the entity ids of every group that has entities."""
+        group_entities: dict[str, list[str]] = {}
+        for group in groups:
+            if entities := self.async_get_entities(group, areas, domains, cached):
+                group_entities[group] = entities
+                _LOGGER.debug("TRMNL: Found %d entities in group '%s'", len(entities), group)
+            else:
+                _LOGGER.debug("TRMNL: No entities found in group '%s'", group)
+        return group_entities
+
+    def _add(self, entry: er.RegistryEntry) -> None:
+        """Add an entity to the index."""
+        if not entry.labels:
+            return
+        entity_id = entry.entity_id
+        self._entity_labels[entity_id] = set(entry.labels)
+        for label in entry.labels:
+            self._label_entities.setdefault(label, {})[entity_id] = None
+
+        area_id = entry.area_id
+        if area_id is None and entry.device_id is not None:
+            device = dr.async_get(self.hass).async_get(entry.device_id)
+            area_id = device.area_id if device else None
+        domain = split_entity_id(entity_id)[0]
+        self._entity_places[entity_id] = (area_id, domain, entry.device_id)
+        self._area_entities.setdefault(area_id, set()).add(entity_id)
+        self._domain_entities.setdefault(domain, set()).add(entity_id)
+        if entry.device_id is not None:
+            self._device_entities.setdefault(entry.device_id, set()).add(entity_id)
+        self._filtered.clear()
+
+    def _remove(self, entity_id: str) -> set[str]:
+        """Remove an entity from the index and return its labels."""
+        labels = self._entity_labels.pop(entity_id, set())
+        for label in labels:
+            entities = self._label_entities[label]
+            entities.pop(entity_id, None)
+            if not entities:
+                del self._label_entities[label]
+
+        if (place := self._entity_places.pop(entity_id, None)) is not None:
+            for index, key in zip(
+                (self._area_entities, self._domain_entities, self._device_entities), place
+            ):
+                if key in index:
+                    index[key].discard(entity_id)
+                    if not index[key]:
+                        del index[key]
+            self._filtered.clear()
+        return labels
+
+    @callback
+    def _async_notify(self, changed: set[str]) -> None:
+        """Tell the listeners which label ids changed membership."""
+        for update_callback in list(self._listeners):
+            update_callback(changed)
+
+    @callback
+    def _async_registry_updated(self, event: Event) -> None:
+        """Patch the index from an entity registry update."""
+        data = event.data
+        action = data["action"]
+        entity_id = data["entity_id"]
+
+        changes = data.get("changes", {})
+        if action == "update" and not (
+            any(key in changes for key in INDEXED_CHANGES) or "old_entity_id" in data
+        ):
+            return
+
+        changed = self._remove(data.get("old_entity_id", entity_id))
+        if action != "remove" and (entry := er.async_get(self.hass).async_get(entity_id)):
+            self._add(entry)
+            changed |= entry.labels
+
+        if not changed:
+            return
+        _LOGGER.debug("TRMNL: Labels changed for %s: %s", entity_id, changed)
+        self._async_notify(changed)
+
+    @callback
+    def _async_device_registry_updated(self, event: Event) -> None:
+        """Move the labelled entities of a device that changed area."""
+        data = event.data
+        if data["action"] != "update" or "area_id" not in data.get("changes", {}):
+            return
+        ent_reg = er.async_get(self.hass)
+        changed: set[str] = set()
+        for entity_id in list(self._device_entities.get(data["device_id"], ())):
+            changed |= self._remove(entity_id)
+            if entry := ent_reg.async_get(entity_id):
+                self._add(entry)
+        if not changed:
+            return
+        _LOGGER.debug("TRMNL: Device %s moved, labels changed: %s", data["device_id"], changed)
+        self._async_notify(changed)
+
+@callback
+def async_get_labels(hass: HomeAssistant) -> list[str]:
+    """Return the sorted ids of all labels."""
+    return sorted(label.label_id for label in lr.async_get(hass).async_list_labels())
+
+@callback
+def async_get_domains(hass: HomeAssistant) -> list[str]:
+    """Return the sorted domains of all registered entities."""
+    return sorted({entry.domain for entry in er.async_get(hass).entities.values()})
+
+@callback
+def async_get_label_index(hass: HomeAssistant) -> LabelIndex:
+    """Return the shared label index, building it on first use."""
+    if (index := hass.data.get(DATA_LABEL_INDEX)) is None:
+        index = hass.data[DATA_LABEL_INDEX] = LabelIndex(hass)
+        index.async_start()
+    return index
+
+@callback
+def async_release_label_index(hass: HomeAssistant) -> None:
+    """Stop and drop the shared label index."""
+    if (index := hass.data.pop(DATA_LABEL_INDEX, None)) is not None:
+        index.async_stop()
@@ -0,0 +1,74 @@
+"""Performance metrics for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import METRICS_LATENCY_SAMPLES
+
+@dataclass
+class PerformanceMetrics:
+    """Performance numbers of a single config entry.
+
+    Durations and latencies are in milliseconds, sizes in bytes. Listeners
+    are called whenever a number changes, sensors use this to update.
+    """
+
+    build_duration: float | None = None
+    label_resolution_duration: float | None = None
+    payload_size: int | None = None
+    payload_size_before_truncation: int | None = None
+    entities_dropped: int = 0
+    pushes: int = 0
+    push_failures: int = 0
+    retries: int = 0
+    skipped_unchanged: int = 0
+    post_latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=METRICS_LATENCY_SAMPLES)
+    )
+    _listeners: list[Callable[[], None]] = field(default_factory=list, repr=False)
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> CALLBACK_TYPE:
+        """Listen for metric updates."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify the listeners of updated metrics."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def post_latency_percentile(self, percentile: float) -> float | None:
+        """Return a percentile of the recent POST latencies."""
+        if not self.post_latencies:
+            return None
+        latencies = sorted(self.post_latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile))]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "build_duration": self.build_duration,
+            "label_resolution_duration": self.label_resolution_duration,
+            "payload_size": self.payload_size,
+            "payload_size_before_truncation": self.payload_size_before_truncation,
+            "entities_dropped": self.entities_dropped,
+            "pushes": self.pushes,
+            "push_failures": self.push_failures,
+            "retries": self.retries,
+            "skipped_unchanged": self.skipped_unchanged,
+            "post_latency_p50": self.post_latency_percentile(0.5),
+            "post_latency_p95": self.post_latency_percentile(0.95),
+            "post_latency_samples": len(self.post_latencies),
+        }
@@ -0,0 +1,142 @@
+"""Payload packing for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .const import PAYLOAD_SCHEMA_STANDARD
+from .encoding import PAYLOAD_ENCODINGS, PayloadEncoding, json_size
+
+def build_payload(
+    grouped_payload: dict[str, list[dict]],
+    timestamp: str,
+    schema: str = PAYLOAD_SCHEMA_STANDARD,
+    encoding: PayloadEncoding | None = None,
+) -> dict:
+    """Build the webhook payload for a grouped payload."""
+    encoding = encoding or PAYLOAD_ENCODINGS[schema]()
+    return {
+        "merge_variables": {
+            # Spread the grouped data directly
+            **encoding.encode(grouped_payload),
+            "timestamp": timestamp,
+            "total_count": sum(len(entities) for entities in grouped_payload.values()),
+            "groups": list(grouped_payload.keys())
+        }
+    }
+
+@dataclass
+class PackResult:
+    """Result of packing a grouped payload into the size budget."""
+
+    grouped_payload: dict[str, list[dict]]
+    size: int
+    full_size: int
+    dropped: int
+
+def pack_grouped_payload(
+    grouped_payload: dict[str, list[dict]],
+    timestamp: str,
+    max_size: int,
+    priorities: dict[str, list[int]] | None = None,
+    fair: bool = True,
+    schema: str = PAYLOAD_SCHEMA_STANDARD,
+    encoding: PayloadEncoding | None = None,
+) -> PackResult:
+    """Fit a grouped payload into max_size bytes in a single pass.
+
+    The byte cost of every entity is computed once. When everything fits the
+    payload is returned as is. Otherwise entities are admitted by descending
+    priority; with fair set, entities of equal priority are taken round-robin
+    across groups so no group is starved, else groups are filled in order.
+    Kept entities stay in their original order within each group. Sizes
+    are computed for the given payload schema, pass an encoding reused
+    across updates to only measure entities that changed.
+    """
+    encoding = encoding or PAYLOAD_ENCODINGS[schema]()
+    encoding.prepare(grouped_payload)
+    total_count = sum(len(entities) for entities in grouped_payload.values())
+
+    # Size of the payload without any groups. The count is taken at its
+    # largest so the result never grows when entities are dropped.
+    base_size = json_size(
+        {
+            "merge_variables": {
+                **encoding.encode({}),
+                "timestamp": timestamp,
+                "total_count": total_count,
+                "groups": [],
+            }
+        }
+    )
+
+    separator_cost = encoding.separator_cost
+    group_costs = {group: encoding.group_cost(group) for group in grouped_payload}
+    entity_costs = {
+        group: [encoding.entity_cost(entity, group) for entity in entities]
+        for group, entities in grouped_payload.items()
+    }
+    # Icons shared by all groups are paid for by the first entity using them
+    entity_icons = {
+        group: [entity.get("icon") if encoding.shared_icons else None for entity in entities]
+        for group, entities in grouped_payload.items()
+    }
+    icon_costs = {
+        icon: encoding.icon_cost(icon)
+        for icons in entity_icons.values()
+        for icon in icons
+        if icon is not None
+    }
+
+    full_size = base_size + sum(icon_costs.values()) + max(len(icon_costs) - 1, 0)
+    for index, group in enumerate(grouped_payload):
+        costs = entity_costs[group]
+        if costs:
+            # Separating comma in the groups list for all but the first group
+            full_size += (
+                group_costs[group] + (1 if index else 0)
+                + sum(costs) + (len(costs) - 1) * separator_cost
+            )
+
+    if full_size <= max_size:
+        return PackResult(grouped_payload, full_size, full_size, 0)
+
+    group_order = {group: index for index, group in enumerate(grouped_payload)}
+    candidates = [
+        (
+            -(priorities[group][rank] if priorities and group in priorities else 0),
+            rank if fair else group_order[group],
+            group_order[group] if fair else rank,
+            group,
+            rank,
+        )
+        for group, costs in entity_costs.items()
+        for rank in range(len(costs))
+    ]
+    candidates.sort()
+
+    size = base_size
+    kept: dict[str, set[int]] = {}
+    kept_icons: set[str] = set()
+    for *_, group, rank in candidates:
+        cost = entity_costs[group][rank]
+        if group in kept:
+            cost += separator_cost
+        else:
+            cost += group_costs[group] + (1 if kept else 0)
+        icon = entity_icons[group][rank]
+        if icon is not None and icon not in kept_icons:
+            cost += icon_costs[icon] + (1 if kept_icons else 0)
+        if size + cost > max_size:
+            continue
+        size += cost
+        kept.setdefault(group, set()).add(rank)
+        if icon is not None:
+            kept_icons.add(icon)
+
+    packed = {
+        group: [entity for rank, entity in enumerate(entities) if rank in kept[group]]
+        for group, entities in grouped_payload.items()
+        if group in kept
+    }
+    dropped = total_count - sum(len(entities) for entities in packed.values())
+    return PackResult(packed, size, full_size, dropped)
@@ -0,0 +1,283 @@
+"""Payload building for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import hashlib
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, State, callback
+from homeassistant.helpers.json import json_bytes
+
+from .const import PRIORITY_LABEL
+from .formatter import EntityFormatRule, EntityFormatter
+from .history import HistoryAggregator
+from .label_index import LabelIndex
+from .snapshot import EntitySnapshot
+from .transform import EntityTransform
+
+_LOGGER = logging.getLogger(__name__)
+
+def create_minimal_entity_payload(state) -> dict:
+    """Create minimal payload for a single entity with name, value, and optional icon."""
+    payload = EntityFormatRule(state).payload(state.state)
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("TRMNL: Created minimal payload for %s: %s", state.entity_id, payload)
+    return payload
+
+def calculate_payload_size(payload: dict) -> int:
+    """Calculate the size of the payload in bytes."""
+    return len(encode_payload(payload))
+
+def encode_payload(payload: dict) -> bytes:
+    """Serialize a payload to the compact JSON body that is posted."""
+    return json_bytes(payload)
+
+def payload_fingerprint(payload: dict) -> str:
+    """Fingerprint the merge variables of a payload, ignoring the timestamp."""
+    merge_variables = {
+        key: value
+        for key, value in payload["merge_variables"].items()
+        if key != "timestamp"
+    }
+    return hashlib.sha1(json_bytes(merge_variables)).hexdigest()
+
+class SensorGroupPayloadBuilder:
+    """Keep a live per-group payload cache for the configured sensor groups.
+
+    Group membership is read from the shared label index and refreshed only
+    when the labels of one of the groups change. Entity payloads come from the
+    shared entity snapshot, so building the payload on a tick only touches
+    groups that changed and entities shown by several entries are formatted once.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        label_index: LabelIndex,
+        snapshot: EntitySnapshot,
+        sensor_groups: list[str],
+        history: HistoryAggregator | None = None,
+        history_groups: list[str] | None = None,
+        priority_label: str = PRIORITY_LABEL,
+        transforms: dict[str, EntityTransform] | None = None,
+        areas: list[str] | None = None,
+        domains: list[str] | None = None,
+    ) -> None:
+        """Initialize the builder."""
+        self.hass = hass
+        self.label_index = label_index
+        self.snapshot = snapshot
+        self.sensor_groups = sensor_groups
+        self.history = history
+        self.history_groups = set(history_groups or ()) & set(sensor_groups) if history else set()
+        self.priority_label = priority_label
+        # Only entities in these areas and domains are shown, empty means all
+        self.areas = areas or []
+        self.domains = domains or []
+        # Custom formats per group label or entity id, entities take precedence
+        self.transforms = transforms or {}
+        self._transformed: dict[tuple[EntityTransform, str], tuple[State, dict, dict]] = {}
+        self._group_entities: dict[str, list[str]] = {}
+        self._entity_groups: dict[str, set[str]] = {}
+        self._priority_entities: set[str] = set()
+        # Entity payloads and priorities of every group, in the same order
+        self._group_payloads: dict[str, tuple[list[dict], list[int]]] = {}
+        self._dirty_groups: set[str] = set()
+        self._changed_entities: set[str] = set()
+        self._priority_listeners: list[Callable[[], None]] = []
+        self.resolve_duration: float | None = None
+        self._unsub_snapshot: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Resolve the groups and start listening for changes."""
+        self._unsub_snapshot = self.snapshot.async_add_consumer(
+            self.sensor_groups, self._async_labels_changed, self._async_entity_changed
+        )
+        self._async_resolve_groups()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for changes."""
+        if self._unsub_snapshot:
+            self._unsub_snapshot()
+            self._unsub_snapshot = None
+        if self.history:
+            self.history.async_stop()
+
+    @callback
+    def _async_resolve_groups(self) -> None:
+        """Resolve group membership of the configured groups."""
+        start = time.perf_counter()
+        group_entities = self.label_index.async_get_groups(
+            self.sensor_groups, self.areas, self.domains
+        )
+
+        entity_groups: dict[str, set[str]] = {}
+        for group, entities in group_entities.items():
+            for entity_id in entities:
+                entity_groups.setdefault(entity_id, set()).add(group)
+
+        self._group_entities = group_entities
+        self._entity_groups = entity_groups
+        self._priority_entities = set(self.label_index.async_get_entities(self.priority_label))
+        self._group_payloads = {}
+        self._transformed = {}
+        self._dirty_groups = set(group_entities)
+        if self.history:
+            self.history.async_set_entities(
+                entity_id
+                for group in self.history_groups
+                for entity_id in group_entities.get(group, ())
+            )
+        self.resolve_duration = (time.perf_counter() - start) * 1000
+
+    @callback
+    def _async_labels_changed(self, labels: set[str]) -> None:
+        """Re-resolve the groups when the membership of one of them changes."""
+        if not any(
+            self.label_index.async_resolve_label(group) in labels
+            for group in (*self.sensor_groups, self.priority_label)
+        ):
+            return
+        _LOGGER.debug("TRMNL: Labels changed, re-resolving groups")
+        self._async_resolve_groups()
+
+    @callback
+    def _async_entity_changed(self, entity_id: str, payload_changed: bool) -> None:
+        """Mark the groups of a changed entity for rebuilding."""
+        if (groups := self._entity_groups.get(entity_id)) is None:
+            return
+        if not payload_changed:
+            # Only custom formats can show a change the default payload hides
+            groups = {group for group in groups if self._async_get_transform(group, entity_id)}
+            if not groups:
+                return
+        self._dirty_groups.update(groups)
+        self._changed_entities.add(entity_id)
+        if entity_id in self._priority_entities:
+            for update_callback in list(self._priority_listeners):
+                update_callback()
+
+    @callback
+    def _async_get_transform(self, group: str, entity_id: str) -> EntityTransform | None:
+        """Return the custom formats of an entity in a group."""
+        return self.transforms.get(entity_id) or self.transforms.get(group)
+
+    @callback
+    def _async_transform(self, group: str, entity_id: str, payload: dict) -> dict:
+        """Apply the custom formats of an entity, reusing the result until it changes."""
+        if (transform := self._async_get_transform(group, entity_id)) is None:
+            return payload
+        if (state := self.hass.states.get(entity_id)) is None:
+            return payload
+        key = (transform, entity_id)
+        if (cached := self._transformed.get(key)) and cached[0] is state and cached[1] is payload:
+            return cached[2]
+        result = transform.apply(state, payload, self.snapshot.async_get_rule(state))
+        self._transformed[key] = (state, payload, result)
+        return result
+
+    @callback
+    def async_add_priority_listener(self, update_callback: Callable[[], None]) -> CALLBACK_TYPE:
+        """Listen for payload changes of priority entities."""
+        self._priority_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._priority_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_build_grouped_payload(
+        self,
+    ) -> tuple[dict[str, list[dict]], dict[str, list[int]]]:
+        """Return the grouped payload and the priorities of its entities.
+
+        Only the groups that changed are rebuilt. Priorities are built in the
+        same pass as the payloads, so they always line up entity for entity.
+        """
+        # Aggregates move with the history window, not only with state changes
+        self._dirty_groups.update(self.history_groups & self._group_entities.keys())
+        for group in self._dirty_groups:
+            payloads = [
+                (entity_id, payload)
+                for entity_id in self._group_entities.get(group, ())
+                if (payload := self.snapshot.async_get_payload(entity_id)) is not None
+            ]
+            if self.transforms:
+                payloads = [
+                    (entity_id, self._async_transform(group, entity_id, payload))
+                    for entity_id, payload in payloads
+                ]
+            if group in self.history_groups:
+                entities = [
+                    {**payload, **aggregate}
+                    if (aggregate := self.history.async_aggregate(entity_id))
+                    else payload
+                    for entity_id, payload in payloads
+                ]
+            else:
+                entities = [payload for _, payload in payloads]
+            priorities = [
+                1 if entity_id in self._priority_entities else 0 for entity_id, _ in payloads
+            ]
+            self._group_payloads[group] = (entities, priorities)
+        self._dirty_groups.clear()
+
+        # Return fresh lists so callers can truncate without touching the cache
+        groups = [
+            group
+            for group in self.sensor_groups
+            if (cached := self._group_payloads.get(group)) and cached[0]
+        ]
+        return (
+            {group: list(self._group_payloads[group][0]) for group in groups},
+            {group: list(self._group_payloads[group][1]) for group in groups},
+        )
+
+    @callback
+    def async_pop_change_ratio(self) -> float:
+        """Return the share of entities that changed since the last call."""
+        ratio = len(self._changed_entities) / max(1, len(self._entity_groups))
+        self._changed_entities.clear()
+        return ratio
+
+    @callback
+    def async_profile(self) -> dict[str, float]:
+        """Time resolving, reading and formatting the groups from scratch in ms.
+
+        Area and domain filters are recomputed instead of served from the
+        label index cache and formatting uses a fresh formatter, so the
+        timings show what a cold rebuild of all groups costs. The label index
+        itself is kept up to date from registry events and is read as is.
+        """
+        start = time.perf_counter()
+        group_entities = self.label_index.async_get_groups(
+            self.sensor_groups, self.areas, self.domains, cached=False
+        )
+        entity_ids = {entity_id for entities in group_entities.values() for entity_id in entities}
+        resolved = time.perf_counter()
+        states = self.snapshot.async_get_states(entity_ids)
+        read = time.perf_counter()
+        formatter = EntityFormatter()
+        for group, entities in group_entities.items():
+            for entity_id in entities:
+                state = states.get(entity_id)
+                if (payload := formatter.format(state)) is not None and (
+                    transform := self._async_get_transform(group, entity_id)
+                ):
+                    transform.apply(state, payload, formatter.rule(state))
+        formatted = time.perf_counter()
+        return {
+            "label_resolution": (resolved - start) * 1000,
+            "state_reads": (read - resolved) * 1000,
+            "formatting": (formatted - read) * 1000,
+        }
+
+    @callback
+    def async_group_sizes(self) -> dict[str, int]:
+        """Return the number of labelled entities per group."""
+        return {group: len(entities) for group, entities in self._group_entities.items()}
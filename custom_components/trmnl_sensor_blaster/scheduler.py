@@ -0,0 +1,130 @@
+"""Update scheduling for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HassJob, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    ADAPTIVE_BUSY_RATIO,
+    ADAPTIVE_INTERVAL_FACTOR,
+    DATA_SCHEDULER,
+    MIN_UPDATE_INTERVAL,
+    UPDATE_STAGGER,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+@dataclass
+class _ScheduledUpdate:
+    """Schedule state of a single config entry."""
+
+    action: Callable[[], Awaitable[None]]
+    interval: float
+    adaptive: bool
+    change_ratio: Callable[[], float] | None
+    current_interval: float
+    next_run: float = 0.0
+    cancel: CALLBACK_TYPE | None = None
+
+class UpdateScheduler:
+    """Run the periodic updates of all config entries.
+
+    Every entry has its own interval. In adaptive mode the interval shrinks
+    while many watched values change and grows again while they are static.
+    Runs are staggered so entries never fire in the same loop iteration.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._updates: dict[str, _ScheduledUpdate] = {}
+
+    @callback
+    def async_add(
+        self,
+        entry_id: str,
+        action: Callable[[], Awaitable[None]],
+        interval: float,
+        adaptive: bool = False,
+        change_ratio: Callable[[], float] | None = None,
+    ) -> CALLBACK_TYPE:
+        """Schedule the periodic update of an entry and return a remove callback."""
+        self.async_remove(entry_id)
+        update = self._updates[entry_id] = _ScheduledUpdate(
+            action, interval, adaptive, change_ratio, interval
+        )
+        self._async_schedule(entry_id, update)
+
+        @callback
+        def remove() -> None:
+            if self._updates.get(entry_id) is update:
+                self.async_remove(entry_id)
+
+        return remove
+
+    @callback
+    def async_remove(self, entry_id: str) -> None:
+        """Stop the periodic update of an entry."""
+        if (update := self._updates.pop(entry_id, None)) and update.cancel:
+            update.cancel()
+
+    @callback
+    def _async_schedule(self, entry_id: str, update: _ScheduledUpdate) -> None:
+        """Schedule the next run of an entry, away from the runs of others."""
+        next_run = time.monotonic() + update.current_interval
+        taken = [
+            other.next_run for other_id, other in self._updates.items() if other_id != entry_id
+        ]
+        while any(abs(next_run - other) < UPDATE_STAGGER for other in taken):
+            next_run += UPDATE_STAGGER
+        update.next_run = next_run
+
+        async def _async_run(_now) -> None:
+            await self._async_run(entry_id, update)
+
+        update.cancel = async_call_later(
+            self.hass, next_run - time.monotonic(), HassJob(_async_run, cancel_on_shutdown=True)
+        )
+
+    async def _async_run(self, entry_id: str, update: _ScheduledUpdate) -> None:
+        """Run an update and schedule the next one."""
+        update.cancel = None
+        try:
+            await update.action()
+        finally:
+            if self._updates.get(entry_id) is update:
+                if update.adaptive and update.change_ratio:
+                    self._async_adapt(update)
+                self._async_schedule(entry_id, update)
+
+    @callback
+    def _async_adapt(self, update: _ScheduledUpdate) -> None:
+        """Adjust the interval of an entry to how much its values change."""
+        ratio = update.change_ratio()
+        shortest = max(MIN_UPDATE_INTERVAL, update.interval / ADAPTIVE_INTERVAL_FACTOR)
+        longest = update.interval * ADAPTIVE_INTERVAL_FACTOR
+        if ratio >= ADAPTIVE_BUSY_RATIO:
+            current = max(shortest, update.current_interval / 2)
+        elif ratio == 0:
+            current = min(longest, update.current_interval * 2)
+        else:
+            # Some activity, drift back to the configured interval
+            current = (update.current_interval + update.interval) / 2
+        if current != update.current_interval:
+            _LOGGER.debug(
+                "TRMNL: Adaptive interval %.0f -> %.0f seconds (%.0f%% changed)",
+                update.current_interval, current, ratio * 100,
+            )
+        update.current_interval = current
+
+@callback
+def async_get_scheduler(hass: HomeAssistant) -> UpdateScheduler:
+    """Return the scheduler shared by all config entries."""
+    if (scheduler := hass.data.get(DATA_SCHEDULER)) is None:
+        scheduler = hass.data[DATA_SCHEDULER] = UpdateScheduler(hass)
+    return scheduler
@@ -0,0 +1,128 @@
+"""Diagnostic sensors for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+from .metrics import PerformanceMetrics
+
+@dataclass(frozen=True, kw_only=True)
+class TrmnlSensorEntityDescription(SensorEntityDescription):
+    """Describes a TRMNL performance sensor."""
+
+    value_fn: Callable[[PerformanceMetrics], float | int | None]
+
+def _duration(key: str, name: str, value_fn) -> TrmnlSensorEntityDescription:
+    """Describe a duration sensor in milliseconds."""
+    return TrmnlSensorEntityDescription(
+        key=key,
+        name=name,
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=1,
+        value_fn=value_fn,
+    )
+
+def _size(key: str, name: str, value_fn) -> TrmnlSensorEntityDescription:
+    """Describe a payload size sensor in bytes."""
+    return TrmnlSensorEntityDescription(
+        key=key,
+        name=name,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=value_fn,
+    )
+
+def _counter(key: str, name: str, value_fn) -> TrmnlSensorEntityDescription:
+    """Describe an increasing counter."""
+    return TrmnlSensorEntityDescription(
+        key=key,
+        name=name,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=value_fn,
+    )
+
+SENSORS: tuple[TrmnlSensorEntityDescription, ...] = (
+    _duration("build_duration", "Last build duration", lambda m: m.build_duration),
+    _duration(
+        "label_resolution_duration",
+        "Label resolution duration",
+        lambda m: m.label_resolution_duration,
+    ),
+    _size("payload_size", "Payload size", lambda m: m.payload_size),
+    _size(
+        "payload_size_before_truncation",
+        "Payload size before truncation",
+        lambda m: m.payload_size_before_truncation,
+    ),
+    TrmnlSensorEntityDescription(
+        key="entities_dropped",
+        name="Entities dropped",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda m: m.entities_dropped,
+    ),
+    _duration("post_latency_p50", "POST latency p50", lambda m: m.post_latency_percentile(0.5)),
+    _duration("post_latency_p95", "POST latency p95", lambda m: m.post_latency_percentile(0.95)),
+    _counter("pushes", "Pushes", lambda m: m.pushes),
+    _counter("push_failures", "Push failures", lambda m: m.push_failures),
+    _counter("retries", "Retries", lambda m: m.retries),
+    _counter("skipped_unchanged", "Skipped unchanged pushes", lambda m: m.skipped_unchanged),
+)
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up the performance sensors of a config entry."""
+    metrics: PerformanceMetrics = hass.data[DOMAIN][entry.entry_id]["metrics"]
+    async_add_entities(
+        TrmnlPerformanceSensor(entry, metrics, description) for description in SENSORS
+    )
+
+class TrmnlPerformanceSensor(SensorEntity):
+    """A performance number of a TRMNL config entry."""
+
+    entity_description: TrmnlSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        metrics: PerformanceMetrics,
+        description: TrmnlSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._metrics = metrics
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name=entry.title,
+            manufacturer="TRMNL",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Update when the metrics change."""
+        self.async_on_remove(self._metrics.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def native_value(self) -> float | int | None:
+        """Return the current value."""
+        return self.entity_description.value_fn(self._metrics)
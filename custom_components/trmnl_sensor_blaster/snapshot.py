@@ -0,0 +1,183 @@
+"""Shared entity snapshot for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback, split_entity_id
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import DATA_ENTITY_SNAPSHOT
+from .formatter import EntityFormatRule, EntityFormatter
+from .label_index import LabelIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+class EntitySnapshot:
+    """Keep formatted payloads of the labelled entities of all config entries.
+
+    Every entry registers the labels of its groups as a consumer. The
+    snapshot follows the union of those labels with a single state change
+    subscription and formats each entity once, however many entries show it.
+    Consumers are told which entities changed and pick their own subset.
+    """
+
+    def __init__(self, hass: HomeAssistant, label_index: LabelIndex) -> None:
+        """Initialize the snapshot."""
+        self.hass = hass
+        self.label_index = label_index
+        # Number of consumers per configured label
+        self._labels: dict[str, int] = {}
+        self._entities: set[str] = set()
+        self._payloads: dict[str, dict | None] = {}
+        self._formatter = EntityFormatter()
+        self._consumers: list[
+            tuple[Callable[[set[str]], None], Callable[[str, bool], None]]
+        ] = []
+        self._unsub_state: CALLBACK_TYPE | None = None
+        self._unsub_index: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start listening for label changes."""
+        self._unsub_index = self.label_index.async_add_listener(self._async_labels_changed)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for changes."""
+        if self._unsub_index:
+            self._unsub_index()
+            self._unsub_index = None
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+
+    @callback
+    def async_add_consumer(
+        self,
+        labels: Iterable[str],
+        labels_changed: Callable[[set[str]], None],
+        entity_changed: Callable[[str, bool], None],
+    ) -> CALLBACK_TYPE:
+        """Follow the entities of labels for a consumer.
+
+        labels_changed is called with the affected label ids after the
+        snapshot caught up with a membership change, entity_changed with the
+        entity id of every new state and whether its payload changed.
+        """
+        labels = list(labels)
+        consumer = (labels_changed, entity_changed)
+        for label in labels:
+            self._labels[label] = self._labels.get(label, 0) + 1
+        self._consumers.append(consumer)
+        self._async_resolve()
+
+        @callback
+        def remove_consumer() -> None:
+            self._consumers.remove(consumer)
+            for label in labels:
+                self._labels[label] -= 1
+                if not self._labels[label]:
+                    del self._labels[label]
+            self._async_resolve()
+
+        return remove_consumer
+
+    @callback
+    def async_get_payload(self, entity_id: str) -> dict | None:
+        """Return the payload of an entity, or None if it should be skipped."""
+        return self._payloads.get(entity_id)
+
+    @callback
+    def async_get_rule(self, state: State) -> EntityFormatRule:
+        """Return the cached formatting rule of a followed entity."""
+        return self._formatter.rule(state)
+
+    @callback
+    def _async_resolve(self) -> None:
+        """Resolve the union of the labels and (re)subscribe to its entities."""
+        entities = {
+            entity_id
+            for label in self._labels
+            for entity_id in self.label_index.async_get_entities(label)
+        }
+        if entities == self._entities:
+            return
+
+        # Followed entities are kept up to date by state changes, only new
+        # ones are read and formatted
+        self._formatter.retain(entities)
+        payloads = {
+            entity_id: self._payloads[entity_id] for entity_id in entities & self._entities
+        }
+        states = self.async_get_states(entities - self._entities)
+        for entity_id in entities - self._entities:
+            payloads[entity_id] = self._formatter.format(states.get(entity_id))
+        self._payloads = payloads
+        self._entities = entities
+        _LOGGER.debug("TRMNL: Snapshot follows %d entities", len(entities))
+
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        if entities:
+            self._unsub_state = async_track_state_change_event(
+                self.hass, list(entities), self._async_state_changed
+            )
+
+    @callback
+    def async_get_states(self, entity_ids: set[str]) -> dict[str, State]:
+        """Read the states of entity_ids in bulk.
+
+        When the entities make up a large share of their domains, like on
+        startup, one pass over the domains is cheaper than a lookup each.
+        """
+        if not entity_ids:
+            return {}
+        domains = {split_entity_id(entity_id)[0] for entity_id in entity_ids}
+        if len(entity_ids) * 2 < self.hass.states.async_entity_ids_count(domains):
+            return {
+                entity_id: state
+                for entity_id in entity_ids
+                if (state := self.hass.states.get(entity_id)) is not None
+            }
+        return {
+            state.entity_id: state
+            for state in self.hass.states.async_all(domains)
+            if state.entity_id in entity_ids
+        }
+
+    @callback
+    def _async_labels_changed(self, labels: set[str]) -> None:
+        """Catch up with a membership change and tell the consumers."""
+        if any(self.label_index.async_resolve_label(label) in labels for label in self._labels):
+            self._async_resolve()
+        for labels_changed, _ in list(self._consumers):
+            labels_changed(labels)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Refresh the payload of a single entity."""
+        entity_id = event.data["entity_id"]
+        if entity_id not in self._entities:
+            return
+        payload = self._formatter.format(event.data["new_state"])
+        if payload_changed := payload != self._payloads.get(entity_id):
+            self._payloads[entity_id] = payload
+        # Consumers with custom formats may show changes the payload hides
+        for _, entity_changed in list(self._consumers):
+            entity_changed(entity_id, payload_changed)
+
+@callback
+def async_get_entity_snapshot(hass: HomeAssistant, label_index: LabelIndex) -> EntitySnapshot:
+    """Return the shared entity snapshot, creating it on first use."""
+    if (snapshot := hass.data.get(DATA_ENTITY_SNAPSHOT)) is None:
+        snapshot = hass.data[DATA_ENTITY_SNAPSHOT] = EntitySnapshot(hass, label_index)
+        snapshot.async_start()
+    return snapshot
+
+@callback
+def async_release_entity_snapshot(hass: HomeAssistant) -> None:
+    """Stop and drop the shared entity snapshot."""
+    if (snapshot := hass.data.pop(DATA_ENTITY_SNAPSHOT, None)) is not None:
+        snapshot.async_stop()
@@ -0,0 +1,131 @@
+"""Custom name and value formats for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from string import Formatter
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, State
+from homeassistant.exceptions import TemplateError
+from homeassistant.helpers.template import Template, is_template_string
+
+from .formatter import EntityFormatRule
+
+_LOGGER = logging.getLogger(__name__)
+
+# Variables available to format specs and templates
+FORMAT_FIELDS = ("name", "value", "state", "unit", "icon", "entity_id", "object_id")
+FORMAT_KEYS = ("name", "value")
+
+def compile_format(hass: HomeAssistant, source: str) -> Callable[[Mapping[str, Any]], str]:
+    """Compile a format spec like `{value:.0f}{unit}` or a template.
+
+    Sources containing `{{` or `{%` are Jinja templates, anything else is a
+    str.format spec over FORMAT_FIELDS. Raises ValueError or TemplateError
+    for an invalid source.
+    """
+    if is_template_string(source):
+        template = Template(source, hass)
+        template.ensure_valid()
+
+        def render_template(variables: Mapping[str, Any]) -> str:
+            return str(template.async_render(variables, parse_result=False))
+
+        return render_template
+
+    parts: list[tuple[str, str | None, str, str | None]] = []
+    for literal, field, format_spec, conversion in Formatter().parse(source):
+        if field is not None and field not in FORMAT_FIELDS:
+            raise ValueError(f"Unknown field {{{field}}}, use one of {', '.join(FORMAT_FIELDS)}")
+        if format_spec and "{" in format_spec:
+            raise ValueError("Nested fields are not supported")
+        parts.append((literal, field, format_spec or "", conversion))
+
+    def render_format(variables: Mapping[str, Any]) -> str:
+        result = []
+        for literal, field, format_spec, conversion in parts:
+            result.append(literal)
+            if field is not None:
+                value = variables[field]
+                if conversion == "r":
+                    value = repr(value)
+                elif conversion is not None:
+                    value = str(value)
+                result.append(format(value, format_spec))
+        return "".join(result)
+
+    return render_format
+
+def format_variables(state: State, rule: EntityFormatRule) -> dict[str, Any]:
+    """Return the variables of a state for format specs and templates."""
+    try:
+        value: float | str = float(state.state)
+    except ValueError:
+        value = state.state
+    return {
+        "name": rule.name,
+        "value": value,
+        "state": state.state,
+        "unit": rule.unit or "",
+        "icon": rule.icon or "",
+        "entity_id": state.entity_id,
+        "object_id": state.object_id,
+    }
+
+class EntityTransform:
+    """Custom name and value formats of a group or a single entity.
+
+    The formats are compiled once when the entry loads. A format that fails
+    for a state, like a number format on a text state, keeps the default.
+    """
+
+    def __init__(self, formats: Mapping[str, Callable[[Mapping[str, Any]], str]]) -> None:
+        """Initialize the transform with compiled formats per payload key."""
+        self._formats = dict(formats)
+
+    def apply(self, state: State, payload: dict, rule: EntityFormatRule) -> dict:
+        """Return the payload with the custom formats applied.
+
+        rule is the cached formatting rule of the entity, its name, unit and
+        icon are the variables of the formats.
+        """
+        variables = format_variables(state, rule)
+        payload = dict(payload)
+        for key, render in self._formats.items():
+            try:
+                payload[key] = render(variables)
+            except (ValueError, TypeError, KeyError, TemplateError) as err:
+                _LOGGER.debug("TRMNL: Custom %s format failed for %s: %s", key, state.entity_id, err)
+        return payload
+
+def compile_transform(hass: HomeAssistant, target: str, config: Any) -> EntityTransform:
+    """Compile the formats of a group or entity.
+
+    Raises ValueError or TemplateError if config is not a mapping of name
+    and/or value to a valid format.
+    """
+    if not isinstance(config, Mapping) or not config.keys() <= set(FORMAT_KEYS):
+        raise ValueError(f"{target} needs a mapping with name and/or value")
+    return EntityTransform({key: compile_format(hass, str(source)) for key, source in config.items()})
+
+def validate_value_formats(
+    hass: HomeAssistant, value_formats: Mapping[str, Any]
+) -> dict[str, EntityTransform]:
+    """Compile value formats, raising for the first invalid one."""
+    return {
+        target: compile_transform(hass, target, config)
+        for target, config in value_formats.items()
+    }
+
+def compile_value_formats(
+    hass: HomeAssistant, value_formats: Mapping[str, Any]
+) -> dict[str, EntityTransform]:
+    """Compile the value formats of an entry, skipping invalid ones."""
+    transforms = {}
+    for target, config in value_formats.items():
+        try:
+            transforms[target] = compile_transform(hass, target, config)
+        except (ValueError, TemplateError) as err:
+            _LOGGER.error("TRMNL: Ignoring invalid format for %s: %s", target, err)
+    return transforms
@@ -1,64 +1,86 @@
 """Platform for TRMNL Sensor Blaster integration."""
 import logging
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.template import Template
+from homeassistant.core import HomeAssistant, callback
 
-from .const import CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS
+from .const import (
+    CONF_AREAS,
+    CONF_DOMAINS,
+    CONF_SENSOR_GROUPS,
+    DATA_LABEL_INDEX,
+    DEFAULT_SENSOR_GROUPS,
+)
+from .label_index import LabelIndex
 
 # Get the logger
 _LOGGER = logging.getLogger(__name__)
 
-def get_entities_by_groups(hass: HomeAssistant, groups: list[str]) -> dict[str, list[str]]:
-    """Get entities with specified group labels using template, organized by group."""
+@callback
+def _async_get_label_index(hass: HomeAssistant) -> LabelIndex | None:
+    """Return the label index of the loaded entries, without creating one.
+
+    The index is owned by the config entries and released with the last
+    one, so these helpers only read it while an entry is loaded.
+    """
+    if (label_index := hass.data.get(DATA_LABEL_INDEX)) is None:
+        _LOGGER.debug("TRMNL: No entry loaded, nothing to resolve")
+    return label_index
+
+@callback
+def async_get_entities_by_groups(
+    hass: HomeAssistant,
+    groups: list[str],
+    areas: list[str] | None = None,
+    domains: list[str] | None = None,
+) -> dict[str, list[str]]:
+    """Get entities with specified group labels from the label index, organized by group."""
     _LOGGER.debug("TRMNL: Fetching entities for groups: %s", groups)
-    grouped_entities = {}
-    
-    for group in groups:
-        _LOGGER.debug("TRMNL: Processing group: %s", group)
-        template_str = f"{{{{ label_entities('{group}') }}}}"
-        template = Template(template_str, hass)
-        try:
-            group_entities = template.async_render()
-            if group_entities:
-                grouped_entities[group] = group_entities
-                _LOGGER.debug("TRMNL: Found %d entities in group '%s'", len(group_entities), group)
-            else:
-                _LOGGER.debug("TRMNL: No entities found in group '%s'", group)
-        except Exception as err:
-            _LOGGER.error("TRMNL: Error processing group '%s': %s", group, err)
-    
-    return grouped_entities
+    if (label_index := _async_get_label_index(hass)) is None:
+        return {}
+    return label_index.async_get_groups(groups, areas, domains)
 
-def get_trmnl_entities(hass: HomeAssistant) -> list[str]:
-    """Get entities with TRMNL label using template (backward compatibility)."""
-    template_str = "{{ label_entities('TRMNL') }}"
-    template = Template(template_str, hass)
-    try:
-        result = template.async_render()
-        _LOGGER.debug("TRMNL: Found %d entities with TRMNL label", len(result) if result else 0)
-        return result if result else []
-    except Exception as err:
-        _LOGGER.error("TRMNL: Error fetching TRMNL entities: %s", err)
+@callback
+def async_get_trmnl_entities(hass: HomeAssistant) -> list[str]:
+    """Get entities with TRMNL label from the label index (backward compatibility)."""
+    if (label_index := _async_get_label_index(hass)) is None:
         return []
+    result = label_index.async_get_entities("TRMNL")
+    _LOGGER.debug("TRMNL: Found %d entities with TRMNL label", len(result))
+    return result
 
-def setup_platform(hass: HomeAssistant, entry) -> None:
+@callback
+def async_setup_platform(hass: HomeAssistant, entry) -> None:
     """Set up the TRMNL Entity Blaster platform."""
-    # Get sensor groups from config entry
-    sensor_groups = entry.data.get(CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS)
-    
-    def process_trmnl_entities():
-        """Find and process entities with configured sensor group labels."""
-        # Get grouped entities
-        grouped_entities = get_entities_by_groups(hass, sensor_groups)
-        
-        total_entities = sum(len(entities) for entities in grouped_entities.values())
-        _LOGGER.info("TRMNL: Found %d entities across %d groups", total_entities, len(grouped_entities))
-        
-        # Log the groups and their entities
-        for group, entities in grouped_entities.items():
-            _LOGGER.info("TRMNL: Group '%s' has %d entities", group, len(entities))
-            for entity_id in entities:
-                _LOGGER.debug("TRMNL: Entity in group '%s': %s", group, entity_id)
+    # Get sensor groups from config entry, options override data like in setup
+    config = {**entry.data, **entry.options}
+    sensor_groups = config.get(CONF_SENSOR_GROUPS, DEFAULT_SENSOR_GROUPS)
+
+    # The label index is a dict lookup, so the groups are resolved right here
+    # in the event loop instead of in a job
+    grouped_entities = async_get_entities_by_groups(
+        hass, sensor_groups, config.get(CONF_AREAS), config.get(CONF_DOMAINS)
+    )
+
+    total_entities = sum(len(entities) for entities in grouped_entities.values())
+    _LOGGER.info("TRMNL: Found %d entities across %d groups", total_entities, len(grouped_entities))
 
-    # Run the processing function
-    hass.add_job(process_trmnl_entities)
\ No newline at end of file
+    # Log the groups and their entities
+    for group, entities in grouped_entities.items():
+        _LOGGER.info("TRMNL: Group '%s' has %d entities", group, len(entities))
+        for entity_id in entities:
+            _LOGGER.debug("TRMNL: Entity in group '%s': %s", group, entity_id)
+
+# The names of the helpers before they became event loop callbacks
+@callback
+def get_entities_by_groups(hass: HomeAssistant, groups: list[str]) -> dict[str, list[str]]:
+    """Get entities with specified group labels, organized by group (backward compatibility)."""
+    return async_get_entities_by_groups(hass, groups)
+
+@callback
+def get_trmnl_entities(hass: HomeAssistant) -> list[str]:
+    """Get entities with TRMNL label (backward compatibility)."""
+    return async_get_trmnl_entities(hass)
+
+@callback
+def setup_platform(hass: HomeAssistant, entry) -> None:
+    """Set up the TRMNL Entity Blaster platform (backward compatibility)."""
+    async_setup_platform(hass, entry)
@@ -0,0 +1,193 @@
+"""Webhook delivery for the TRMNL Entity Blaster integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import random
+import time
+
+import aiohttp
+from yarl import URL
+
+from homeassistant.const import CONTENT_TYPE_JSON
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import (
+    CIRCUIT_BREAKER_COOLDOWN,
+    CIRCUIT_BREAKER_THRESHOLD,
+    DATA_WEBHOOK_CLIENT,
+    DOMAIN,
+    MAX_CONNECTIONS_PER_HOST,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    WEBHOOK_TIMEOUT,
+)
+from .metrics import PerformanceMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+class TrmnlWebhookClient:
+    """Post payloads to TRMNL webhooks over one pooled, keep-alive session.
+
+    All config entries share Home Assistant's client session, so pushes to
+    plugins on the same host reuse open connections. Concurrent pushes are
+    capped per host to stay friendly to the TRMNL API.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession) -> None:
+        """Initialize the client."""
+        self._session = session
+        self._timeout = aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT)
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    async def async_post(self, url: str, body: bytes) -> tuple[int, str]:
+        """Post an encoded JSON payload and return the response status and text."""
+        host = URL(url).host or ""
+        if (limit := self._host_limits.get(host)) is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+
+        async with limit:
+            async with self._session.post(
+                url,
+                data=body,
+                headers={"Content-Type": CONTENT_TYPE_JSON},
+                timeout=self._timeout,
+            ) as response:
+                return response.status, await response.text()
+
+@callback
+def async_get_webhook_client(hass: HomeAssistant) -> TrmnlWebhookClient:
+    """Return the webhook client shared by all config entries."""
+    if (client := hass.data.get(DATA_WEBHOOK_CLIENT)) is None:
+        client = hass.data[DATA_WEBHOOK_CLIENT] = TrmnlWebhookClient(
+            async_get_clientsession(hass)
+        )
+    return client
+
+class TrmnlDeliveryWorker:
+    """Deliver payloads for one config entry in the background.
+
+    Only the newest payload is kept, so a slow or failing webhook never
+    builds a backlog. Failed pushes are retried with exponential backoff and
+    jitter, and after repeated failures the circuit opens and the endpoint
+    is left alone for a cooldown before a single probe is sent.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: TrmnlWebhookClient,
+        url: str,
+        on_delivered: Callable[[dict, str], None],
+        metrics: PerformanceMetrics,
+    ) -> None:
+        """Initialize the worker."""
+        self.hass = hass
+        self.client = client
+        self.url = url
+        self.metrics = metrics
+        self._on_delivered = on_delivered
+        self._pending: tuple[dict, bytes, str] | None = None
+        self._wakeup = asyncio.Event()
+        self._failures = 0
+        self._task: asyncio.Task | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start the background delivery task."""
+        self._task = self.hass.async_create_background_task(
+            self._async_run(), f"{DOMAIN} delivery {self.url}"
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the background delivery task, dropping any pending payload."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._pending = None
+
+    @callback
+    def async_enqueue(self, payload: dict, body: bytes, fingerprint: str) -> None:
+        """Queue a payload and its encoded body, replacing any payload not yet sent."""
+        if self._pending is not None:
+            _LOGGER.debug("TRMNL: Replacing pending payload for %s with a newer one", self.url)
+        self._pending = (payload, body, fingerprint)
+        self._wakeup.set()
+
+    async def _async_run(self) -> None:
+        """Deliver queued payloads until cancelled."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._pending is None:
+                continue
+            payload, body, fingerprint = self._pending
+            self._pending = None
+
+            delivered = await self._async_deliver(payload, body)
+            if delivered:
+                self.metrics.pushes += 1
+            else:
+                self.metrics.push_failures += 1
+            self.metrics.async_update_listeners()
+            if delivered is not False:
+                self._failures = 0
+                if delivered:
+                    self._on_delivered(payload, fingerprint)
+                continue
+
+            # Retry the failed payload unless a newer one arrived meanwhile
+            if self._pending is None:
+                self._pending = (payload, body, fingerprint)
+            self._failures += 1
+            self.metrics.retries += 1
+            if self._failures >= CIRCUIT_BREAKER_THRESHOLD:
+                delay = CIRCUIT_BREAKER_COOLDOWN
+                _LOGGER.warning(
+                    "TRMNL: Webhook failed %d times in a row, pausing deliveries for %d seconds",
+                    self._failures, delay,
+                )
+            else:
+                delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (self._failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                _LOGGER.debug("TRMNL: Retrying webhook in %.1f seconds", delay)
+            await asyncio.sleep(delay)
+            self._wakeup.set()
+
+    async def _async_deliver(self, payload: dict, body: bytes) -> bool | None:
+        """Post the encoded body of a payload.
+
+        Returns True when it was delivered, False when it should be retried
+        and None when it was rejected and retrying would not help.
+        """
+        merge_variables = payload["merge_variables"]
+        try:
+            _LOGGER.debug("TRMNL: Sending POST request to %s", self.url)
+            start = time.perf_counter()
+            status, response_text = await self.client.async_post(self.url, body)
+            self.metrics.post_latencies.append((time.perf_counter() - start) * 1000)
+        except asyncio.TimeoutError:
+            _LOGGER.error("TRMNL: Timeout sending data to webhook")
+            return False
+        except aiohttp.ClientError as err:
+            _LOGGER.error("TRMNL: Failed to send data to webhook: %s", err)
+            return False
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("TRMNL: Failed to send data to webhook: %s", err)
+            return None
+
+        if status == 200:
+            _LOGGER.info("TRMNL: Successfully sent %d entities from %d groups",
+                         merge_variables["total_count"], len(merge_variables["groups"]))
+            _LOGGER.debug("TRMNL: Webhook response: %s", response_text)
+            return True
+
+        _LOGGER.error("TRMNL: Error sending to webhook: HTTP %s", status)
+        _LOGGER.error("TRMNL: Response: %s", response_text)
+        if status == 429 or status >= 500:
+            return False
+        # Other client errors will not go away by retrying the same payload
+        return None
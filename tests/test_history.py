@@ -0,0 +1,63 @@
+"""Tests for the rolling history aggregate."""
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.trmnl_sensor_blaster.history import RollingAggregate  # noqa: E402
+
+def test_empty_aggregate():
+    """An aggregate without samples has nothing to show."""
+    assert RollingAggregate().aggregate(0, 4) is None
+
+def test_buckets_and_gaps():
+    """Buckets average their samples and gaps repeat the latest value."""
+    aggregate = RollingAggregate()
+    aggregate.add(0, 0, 1.0, 10)
+    aggregate.add(0, 0, 2.0, 20)
+    aggregate.add(2, 0, 21.0, 30)
+    assert aggregate.aggregate(0, 4) == {
+        "min": 10,
+        "max": 30,
+        # Weighted by time: 15, 20 (gap after the latest sample), 30, 30
+        "avg": 23.8,
+        "spark": [15, 20, 30, 30],
+    }
+
+def test_leading_gap_uses_earlier_sample():
+    """Samples before the window fill the buckets before the first sample."""
+    aggregate = RollingAggregate()
+    aggregate.add(7, 10, 75.0, 5)
+    aggregate.add(9, 10, 95.0, 7)
+    aggregate.add(11, 10, 115.0, 9)
+    result = aggregate.aggregate(10, 3)
+    assert result["spark"] == [7, 9, 9]
+    assert (result["min"], result["max"]) == (7, 9)
+
+def test_prune_keeps_latest_sample():
+    """Pruned buckets are folded into the sample carried into the window."""
+    aggregate = RollingAggregate()
+    aggregate.add(0, 0, 1.0, 1)
+    aggregate.add(1, 0, 11.0, 2)
+    aggregate.add(2, 0, 21.0, 3)
+    aggregate.prune(2)
+    assert set(aggregate.buckets) == {2}
+    assert (aggregate.carry, aggregate.carry_time) == (2, 11.0)
+    assert aggregate.aggregate(2, 2)["spark"] == [3, 3]
+    assert aggregate.aggregate(2, 2)["min"] == 2
+
+def test_out_of_order_samples():
+    """The latest value of a bucket follows the timestamps, not the arrival."""
+    aggregate = RollingAggregate()
+    aggregate.add(0, 0, 5.0, 1)
+    aggregate.add(0, 0, 3.0, 2)
+    aggregate.prune(1)
+    assert aggregate.carry == 1
+
+def test_rounding():
+    """Values are rounded to one decimal and whole numbers lose the fraction."""
+    aggregate = RollingAggregate()
+    aggregate.add(0, 0, 1.0, 20.04)
+    aggregate.add(1, 0, 11.0, 21.26)
+    result = aggregate.aggregate(0, 2)
+    assert result["spark"] == [20, 21.3]
+    assert result["avg"] == 20.6
@@ -0,0 +1,104 @@
+"""Tests for payload packing and encodings."""
+import random
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.helpers.json import json_bytes  # noqa: E402
+
+from custom_components.trmnl_sensor_blaster.const import PAYLOAD_SCHEMAS  # noqa: E402
+from custom_components.trmnl_sensor_blaster.encoding import PAYLOAD_ENCODINGS  # noqa: E402
+from custom_components.trmnl_sensor_blaster.packing import (  # noqa: E402
+    build_payload,
+    pack_grouped_payload,
+)
+
+TIMESTAMP = "2025-06-26T12:00:00.000000"
+
+def _encoded_size(grouped_payload, schema):
+    """Return the size of the payload as it is posted."""
+    return len(json_bytes(build_payload(grouped_payload, TIMESTAMP, schema)))
+
+def _entity(rng, index, icons, history=False):
+    """Return a random entity payload."""
+    entity = {"name": f"Entity {index} {'ä' * rng.randint(0, 3)}", "value": f"{rng.uniform(-50, 50):.1f}°C"}
+    if icons and rng.random() < 0.8:
+        entity["icon"] = rng.choice(icons)
+    if history:
+        spark = [round(rng.uniform(0, 30), 1) for _ in range(rng.randint(1, 12))]
+        entity.update(min=min(spark), max=max(spark), avg=round(sum(spark) / len(spark), 1), spark=spark)
+    return entity
+
+def _grouped_payload(rng):
+    """Return a random grouped payload."""
+    icons = [f"mdi:icon-{index}" for index in range(rng.randint(0, 25))]
+    return {
+        f"group_{group}": [
+            _entity(rng, index, icons, history)
+            for index in range(rng.randint(1, 15))
+        ]
+        for group in range(rng.randint(1, 5))
+        for history in [rng.random() < 0.3]
+    }
+
+@pytest.mark.parametrize("schema", PAYLOAD_SCHEMAS)
+def test_full_size_is_encoded_size(schema):
+    """The size of a payload that fits is exactly its encoded size."""
+    rng = random.Random(schema)
+    for _ in range(200):
+        grouped = _grouped_payload(rng)
+        result = pack_grouped_payload(grouped, TIMESTAMP, 1_000_000, schema=schema)
+        assert result.dropped == 0
+        assert result.size == result.full_size == _encoded_size(grouped, schema)
+
+@pytest.mark.parametrize("schema", PAYLOAD_SCHEMAS)
+def test_packed_payload_fits(schema):
+    """A truncated payload never exceeds the budget it was packed for."""
+    rng = random.Random(schema)
+    for _ in range(200):
+        grouped = _grouped_payload(rng)
+        full_size = _encoded_size(grouped, schema)
+        max_size = rng.randint(150, max(full_size, 151))
+        result = pack_grouped_payload(grouped, TIMESTAMP, max_size, schema=schema)
+        encoded_size = _encoded_size(result.grouped_payload, schema)
+        assert encoded_size <= result.size <= max_size
+        assert result.full_size == full_size
+
+def test_columnar_many_icons_exact_budget():
+    """Icon indexes below 10 are charged one digit when there are more icons."""
+    grouped = {
+        "icons_test": [
+            {"name": f"E{index}", "value": "1", "icon": f"mdi:icon-{index}"}
+            for index in range(11)
+        ]
+    }
+    size = _encoded_size(grouped, "columnar")
+    result = pack_grouped_payload(grouped, TIMESTAMP, size, schema="columnar")
+    assert result.dropped == 0
+    assert result.size == result.full_size == size
+
+def test_priorities_are_kept_first():
+    """Priority entities are kept when the payload is truncated."""
+    grouped = {"group": [{"name": f"Entity {index}", "value": "1"} for index in range(50)]}
+    priorities = {"group": [1 if index >= 45 else 0 for index in range(50)]}
+    result = pack_grouped_payload(grouped, TIMESTAMP, 300, priorities)
+    names = [entity["name"] for entity in result.grouped_payload["group"]]
+    assert result.dropped
+    assert {f"Entity {index}" for index in range(45, 50)} <= set(names)
+
+@pytest.mark.parametrize("schema", PAYLOAD_SCHEMAS)
+def test_reused_encoding_matches_fresh(schema):
+    """An encoding reused across updates sizes like a fresh one."""
+    rng = random.Random(schema)
+    encoding = PAYLOAD_ENCODINGS[schema]()
+    grouped = _grouped_payload(rng)
+    for _ in range(20):
+        # Keep some entity objects and replace others, like live updates do
+        grouped = {
+            group: [entity if rng.random() < 0.5 else dict(entity, value="2") for entity in entities]
+            for group, entities in grouped.items()
+        }
+        reused = pack_grouped_payload(grouped, TIMESTAMP, 800, encoding=encoding)
+        fresh = pack_grouped_payload(grouped, TIMESTAMP, 800, schema=schema)
+        assert (reused.size, reused.full_size, reused.dropped) == (fresh.size, fresh.full_size, fresh.dropped)